@@ -5,26 +5,279 @@ Provides the MailArchiver class for connecting to IMAP servers,
 listing folders, and downloading emails with attachments.
 """
 
-import email
+# pylint: disable=too-many-lines
+
+import base64
+import binascii
+import hashlib
+import imaplib
+import io
+import json
 import os
+import quopri
+import tarfile
+import tempfile
+import zlib
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass
 from datetime import datetime
+from email import policy
+from email.message import Message
+from email.parser import BytesHeaderParser, BytesParser
+from functools import partial
+from itertools import islice
 from pathlib import Path
 from typing import Optional
 
 from imapclient import IMAPClient
 from imapclient.exceptions import IMAPClientError
-from rich.console import Console
-from rich.prompt import Confirm
-from rich.table import Table
 
-from pathvalidate import sanitize_filename
+from .utils import console, create_progress_bar, decode_mime_header, sanitize_filename
 
-from .utils import create_progress_bar, decode_mime_header
+# Number of UIDs requested per FETCH command. Larger batches save round-trips
+# but some servers reject overly long command lines.
+FETCH_BATCH_SIZE = 100
+MAX_FETCH_BATCH_SIZE = 500
 
-console = Console()
+# Maximum UIDs per STORE/EXPUNGE command (RFC 2683 section 3.2.1.5)
+DELETE_BATCH_SIZE = 1000
 
+# Local storage layouts: one directory per message, or one compressed tar per run
+# mapped to its streaming tarfile mode (tar.zst needs the optional zstandard package)
+ARCHIVE_FORMATS = {"dir": None, "tar.gz": "w|gz", "tar.xz": "w|xz", "tar.zst": "w|"}
 
-class MailArchiver:
+# Suffix of the member name -> size index written next to each complete tar archive
+ARCHIVE_INDEX_SUFFIX = ".index.json"
+
+# Content-addressed attachment store shared by all folders of an output directory
+ATTACHMENT_STORE_DIR = "_attachments"
+
+# Items fetched per message for full downloads and for headers-only downloads
+BODY_FETCH_ITEMS = ["RFC822", "INTERNALDATE"]
+HEADER_FETCH_ITEMS = ["BODY.PEEK[HEADER]", "INTERNALDATE"]
+
+# Message metadata used to detect messages that are already downloaded
+METADATA_FETCH_ITEMS = ["INTERNALDATE", "RFC822.SIZE", "BODY.PEEK[HEADER.FIELDS (SUBJECT)]"]
+
+# Directory next to the folder outputs holding one <folder>.json per folder with
+# the UIDVALIDITY/HIGHESTMODSEQ of the last incremental download. It lives outside
+# the folder directories so it is neither uploaded nor removed with --delete-local.
+SYNC_STATE_DIR = ".imap_state"
+
+# Threads that parse fetched messages and write them to disk, and the number
+# of fetched-but-unwritten messages allowed in memory before fetching waits
+PERSIST_WORKERS = 4
+PERSIST_QUEUE_SIZE = 32
+
+# Content-Transfer-Encodings that can be decoded from one file object to another
+_STREAMING_DECODERS = {
+    "base64": base64.decode,
+    "quoted-printable": quopri.decode,
+}
+
+# Shared parsers; the header parser stops after the header block, bodies are only
+# parsed when needed. compat32 keeps headers as plain strings instead of eagerly
+# building header objects, decode_mime_header decodes them where needed.
+_HEADER_PARSER = BytesHeaderParser(policy=policy.compat32)
+_MESSAGE_PARSER = BytesParser(policy=policy.compat32)
+
+# Size of raw socket reads on a compressed connection
+COMPRESSED_READ_SIZE = 64 * 1024
+
+
+class _DeflateReader(io.RawIOBase):
+    """Raw stream inflating data read from a COMPRESS=DEFLATE socket."""
+
+    def __init__(self, sock):
+        super().__init__()
+        self._sock = sock
+        self._inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            data = self._sock.recv(COMPRESSED_READ_SIZE)
+            if not data:
+                return 0
+            self._pending = self._inflater.decompress(data)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def _enable_deflate(imap: imaplib.IMAP4) -> bool:
+    """
+    Negotiate COMPRESS=DEFLATE and wrap the connection's reader and sender.
+
+    This relies on imaplib internals (_simple_command, file and send), which
+    is why compression is opt-in through the provider's ``compress`` option.
+
+    Returns: True if the server accepted compression
+    """
+    # Register COMPRESS (RFC 4978) with imaplib, the same way imapclient adds its
+    # extensions, but only once compression is actually requested
+    imaplib.Commands.setdefault("COMPRESS", ("AUTH", "SELECTED"))
+    response = imap._simple_command("COMPRESS", "DEFLATE")  # pylint: disable=protected-access
+    if response[0] != "OK":
+        return False
+
+    sock = imap.sock
+    deflater = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+
+    def send(data: bytes) -> None:
+        sock.sendall(deflater.compress(data) + deflater.flush(zlib.Z_SYNC_FLUSH))
+
+    imap.file = io.BufferedReader(_DeflateReader(sock))
+    imap.send = send  # type: ignore[method-assign]
+    return True
+
+
+def _write_bytes(path: Path, data: bytes) -> None:
+    """Write in-memory bytes to a file with raw os.write, bypassing buffered I/O."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        os.close(fd)
+
+
+def _get_zstandard():
+    """Lazy load zstandard module."""
+    try:
+        import zstandard  # pylint: disable=import-outside-toplevel
+    except ImportError as err:
+        raise ImportError("zstandard not installed. Run: pip install zstandard") from err
+    return zstandard
+
+
+@contextmanager
+def _open_tar_archive(path: Path, archive_format: str) -> Iterator[tarfile.TarFile]:
+    """Open a streaming tar archive for writing in one of the ARCHIVE_FORMATS."""
+    with open(path, "wb") as f:
+        if archive_format == "tar.zst":
+            compressor = _get_zstandard().ZstdCompressor(level=3)
+            with compressor.stream_writer(f, closefd=False) as zf, tarfile.open(fileobj=zf, mode="w|") as tar:
+                yield tar
+        else:
+            with tarfile.open(fileobj=f, mode=ARCHIVE_FORMATS[archive_format]) as tar:
+                yield tar
+
+
+def _archive_index_path(archive_path: Path) -> Path:
+    """Return where the member index of a tar archive is stored."""
+    return archive_path.with_name(archive_path.name + ARCHIVE_INDEX_SUFFIX)
+
+
+def _save_archive_index(archive_path: Path, index: dict[str, int]) -> None:
+    """Store the member names and sizes of a complete archive next to it."""
+    try:
+        with open(_archive_index_path(archive_path), "w", encoding="utf-8") as f:
+            json.dump(index, f)
+    except OSError as e:
+        console.print(f"[yellow]Could not save archive index: {e}[/yellow]")
+
+
+def _load_archived_members(folder_output: Path, archive_format: str) -> dict[str, dict[str, int]]:
+    """
+    Map each email directory name in the folder's earlier archives to its member sizes.
+
+    Only the small index written next to each complete archive is read, so the
+    cost does not grow with the archives. An archive without an index (from an
+    interrupted run) is ignored, and its messages are fetched again.
+    """
+    members: dict[str, dict[str, int]] = {}
+    for index_path in folder_output.glob(f"archive_*.{archive_format}{ARCHIVE_INDEX_SUFFIX}"):
+        try:
+            with open(index_path, encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if not isinstance(index, dict):
+            continue
+        for name, size in index.items():
+            email_dir, _, filename = name.partition("/")
+            members.setdefault(email_dir, {})[filename] = size
+    return members
+
+
+def _sync_state_path(folder_output: Path) -> Path:
+    """Return where the sync state of a folder output directory is stored."""
+    return folder_output.parent / SYNC_STATE_DIR / f"{folder_output.name}.json"
+
+
+def _load_sync_state(folder_output: Path) -> Optional[dict]:
+    """Load the sync state stored by a previous download, if any."""
+    try:
+        with open(_sync_state_path(folder_output), encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if isinstance(state, dict) else None
+
+
+def _save_sync_state(folder_output: Path, state: dict) -> None:
+    """Store the folder's sync state for the next incremental download."""
+    state_path = _sync_state_path(folder_output)
+    try:
+        state_path.parent.mkdir(exist_ok=True)
+        with open(state_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+    except OSError as e:
+        console.print(f"[yellow]Could not save sync state: {e}[/yellow]")
+
+
+def _has_local_messages(folder_output: Path) -> bool:
+    """Check whether the folder output still holds anything from a previous download."""
+    try:
+        with os.scandir(folder_output) as entries:
+            return any(not entry.name.startswith(".") for entry in entries)
+    except OSError:
+        return False
+
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    """Yield successive lists of at most ``size`` items."""
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _compact_uid_set(uids: list[int]) -> str:
+    """Collapse UIDs into an IMAP sequence set such as ``1:50,52,54:60``."""
+    ranges = []
+    ordered = sorted(uids)
+    start = end = ordered[0]
+    for uid in ordered[1:]:
+        if uid == end + 1:
+            end = uid
+            continue
+        ranges.append(f"{start}:{end}" if end > start else str(start))
+        start = end = uid
+    ranges.append(f"{start}:{end}" if end > start else str(start))
+    return ",".join(ranges)
+
+
+@dataclass
+class _DownloadPlan:
+    """Messages of a folder selected for download and how to fetch them."""
+
+    messages: list
+    emails_skipped: int = 0
+    sync_state: Optional[dict] = None
+    download_bodies: bool = True
+
+
+class MailArchiver:  # pylint: disable=too-many-instance-attributes
     """Main class for archiving mail from any IMAP server."""
 
     def __init__(self, email_address: str, password: str, provider_config: dict):
@@ -34,15 +287,40 @@ class MailArchiver:
         self.imap_port = provider_config.get("imap_port", 993)
         self.ssl = provider_config.get("ssl", True)
         self.provider_name = provider_config.get("name", "Mail Server")
+        self.compress = provider_config.get("compress", False)
+        batch_size = int(provider_config.get("fetch_batch_size", FETCH_BATCH_SIZE))
+        self.fetch_batch_size = max(1, min(batch_size, MAX_FETCH_BATCH_SIZE))
+        self.persist_workers = max(1, int(provider_config.get("persist_workers", PERSIST_WORKERS)))
+        self.archive_format = self._resolve_archive_format(provider_config.get("archive_format", "dir"))
+        self.dedupe_attachments = provider_config.get("dedupe_attachments", False)
+        self.incremental_sync = provider_config.get("incremental_sync", False)
         self.client: Optional[IMAPClient] = None
+        # (folder, readonly, SELECT response) of the currently selected folder
+        self._selected: Optional[tuple[str, bool, dict]] = None
+
+    @staticmethod
+    def _resolve_archive_format(archive_format: str) -> str:
+        """Validate the configured archive format, falling back to a supported one."""
+        if archive_format not in ARCHIVE_FORMATS:
+            console.print(f"[yellow]Unknown archive format '{archive_format}', using 'dir'[/yellow]")
+            return "dir"
+        if archive_format == "tar.zst":
+            try:
+                _get_zstandard()
+            except ImportError as e:
+                console.print(f"[yellow]{e}. Using 'tar.gz' instead[/yellow]")
+                return "tar.gz"
+        return archive_format
 
     def connect(self) -> bool:
         """Connect to IMAP server."""
         try:
             console.print(f"[cyan]Connecting to {self.imap_host}...[/cyan]")
             self.client = IMAPClient(self.imap_host, port=self.imap_port, ssl=self.ssl)
+            self._selected = None
             self.client.login(self.email_address, self.password)
             console.print("[green]✓ Successfully connected and logged in[/green]")
+            self._enable_compression()
             return True
         except IMAPClientError as e:
             console.print(f"[red]✗ Failed to connect: {e}[/red]")
@@ -51,6 +329,16 @@ class MailArchiver:
             console.print(f"[red]✗ Network error: {e}[/red]")
             return False
 
+    def _enable_compression(self) -> None:
+        """Enable COMPRESS=DEFLATE if configured and supported by the server."""
+        if not self.client or not self.compress or not self.client.has_capability("COMPRESS=DEFLATE"):
+            return
+        try:
+            if _enable_deflate(self.client._imap):  # pylint: disable=protected-access
+                console.print("[dim]Using COMPRESS=DEFLATE[/dim]")
+        except imaplib.IMAP4.error:
+            pass  # Compression is optional; continue uncompressed
+
     def disconnect(self):
         """Disconnect from the IMAP server."""
         if self.client:
@@ -60,6 +348,21 @@ class MailArchiver:
             except IMAPClientError:
                 pass
 
+    def _select_folder(self, folder_name: str, readonly: bool) -> dict:
+        """
+        Select a folder, reusing the previous SELECT response if it is already selected.
+
+        Skips the round trip when consecutive operations work on the same
+        folder in the same mode; deleting messages clears the cache.
+        """
+        if self._selected and self._selected[:2] == (folder_name, readonly):
+            return self._selected[2]
+        # A failed SELECT leaves no folder selected (RFC 3501 section 6.3.1)
+        self._selected = None
+        select_info = self.client.select_folder(folder_name, readonly=readonly)
+        self._selected = (folder_name, readonly, select_info)
+        return select_info
+
     def list_folders(self) -> list[tuple[str, str | int]]:
         """List all mail folders."""
         if not self.client:
@@ -73,17 +376,24 @@ class MailArchiver:
         return folders
 
     def _get_folder_count_safe(self, folder_name: str) -> str | int:
-        """Get message count for a folder, returning '?' on error."""
+        """
+        Get message count for a folder, returning '?' on error.
+
+        Uses STATUS rather than SELECT, so the currently selected folder
+        is left alone and no mailbox state has to be loaded by the server.
+        """
         if not self.client:
             return "?"
         try:
-            select_info = self.client.select_folder(folder_name, readonly=True)
-            return select_info.get(b"EXISTS", 0)
+            status = self.client.folder_status(folder_name, [b"MESSAGES"])
+            return status.get(b"MESSAGES", 0)
         except IMAPClientError:
             return "?"
 
     def display_folders(self, folders: list[tuple[str, str | int]]) -> None:
         """Display folders in a nice table."""
+        from rich.table import Table  # pylint: disable=import-outside-toplevel
+
         table = Table(title=f"{self.provider_name} Folders")
         table.add_column("#", style="cyan", justify="right")
         table.add_column("Folder Name", style="green")
@@ -100,16 +410,21 @@ class MailArchiver:
             return 0
 
         try:
-            select_info = self.client.select_folder(folder_name, readonly=True)
+            select_info = self._select_folder(folder_name, readonly=True)
             return select_info.get(b"EXISTS", 0)
         except IMAPClientError as e:
             console.print(f"[red]Error selecting folder: {e}[/red]")
             return 0
 
-    def download_folder(self, folder_name: str, output_path: Path, dry_run: bool = False) -> tuple[int, int]:
+    def download_folder(
+        self, folder_name: str, output_path: Path, dry_run: bool = False, download_bodies: bool = True
+    ) -> tuple[int, int]:
         """
         Download all emails and attachments from a folder.
 
+        With download_bodies=False only the header block of each message is
+        fetched and saved as headers.eml; bodies and attachments are skipped.
+
         Returns: (emails_downloaded, attachments_downloaded)
         """
         if not self.client:
@@ -129,16 +444,32 @@ class MailArchiver:
         # Create output directory
         folder_output = self._create_folder_output_dir(folder_name, output_path)
 
-        # Download messages
-        messages = self.client.search(["ALL"])
-        return self._download_messages(messages, folder_name, folder_output)
+        plan = self._plan_download(folder_name, folder_output, download_bodies)
+        return self._download_messages(plan, folder_name, folder_output)
+
+    def _plan_download(self, folder_name: str, folder_output: Path, download_bodies: bool) -> _DownloadPlan:
+        """Select the messages of the current folder that still need downloading."""
+        if not download_bodies:
+            # Headers are cheap to fetch; the sync state only tracks full downloads
+            messages = self.client.search(["ALL"])
+            if self.archive_format == "dir":
+                return _DownloadPlan(messages, download_bodies=False)
+            # Archives cannot skip a member on write, so drop archived messages up front
+            messages, emails_skipped = self._filter_downloaded_messages(messages, folder_output, download_bodies=False)
+            return _DownloadPlan(messages, emails_skipped, download_bodies=False)
+
+        # Download messages that are not already archived locally
+        sync_state = self._get_sync_state(folder_name)
+        messages = self._search_messages_to_download(sync_state, folder_output)
+        messages, emails_skipped = self._filter_downloaded_messages(messages, folder_output)
+        return _DownloadPlan(messages, emails_skipped, sync_state)
 
     def _select_folder_for_download(self, folder_name: str) -> Optional[int]:
         """Select a folder and return message count, or None on error."""
         if not self.client:
             return None
         try:
-            select_info = self.client.select_folder(folder_name, readonly=True)
+            select_info = self._select_folder(folder_name, readonly=True)
             return select_info.get(b"EXISTS", 0)
         except IMAPClientError as e:
             console.print(f"[red]Error selecting folder '{folder_name}': {e}[/red]")
@@ -159,65 +490,302 @@ class MailArchiver:
         folder_output.mkdir(parents=True, exist_ok=True)
         return folder_output
 
-    def _download_messages(self, messages: list, folder_name: str, folder_output: Path) -> tuple[int, int]:
-        """Download all messages with progress bar."""
-        emails_downloaded = 0
-        emails_skipped = 0
-        attachments_downloaded = 0
+    def _get_sync_state(self, folder_name: str) -> Optional[dict]:
+        """
+        Get the folder's UIDVALIDITY and HIGHESTMODSEQ for incremental downloads.
 
-        with create_progress_bar() as progress:
-            task = progress.add_task(f"Downloading from {folder_name}...", total=len(messages))
+        Only used when incremental_sync is enabled and the server supports CONDSTORE.
 
-            for uid in messages:
-                result, attach_count = self._process_single_message(uid, folder_output)
-                if result == "downloaded":
-                    emails_downloaded += 1
-                    attachments_downloaded += attach_count
-                elif result == "skipped":
-                    emails_skipped += 1
-                progress.advance(task)
+        Returns: dict with 'uidvalidity' and 'highestmodseq', or None
+        """
+        if not self.client or not self.incremental_sync or not self.client.has_capability("CONDSTORE"):
+            return None
+        try:
+            status = self.client.folder_status(folder_name, [b"UIDVALIDITY", b"HIGHESTMODSEQ"])
+            return {
+                "uidvalidity": int(status[b"UIDVALIDITY"]),
+                "highestmodseq": int(status[b"HIGHESTMODSEQ"]),
+            }
+        except (IMAPClientError, KeyError, TypeError, ValueError):
+            return None
 
-        self._show_download_summary(emails_downloaded, attachments_downloaded, emails_skipped)
-        return (emails_downloaded, attachments_downloaded)
+    def _search_messages_to_download(self, sync_state: Optional[dict], folder_output: Path) -> list:
+        """
+        Search for messages to download, incrementally when possible.
 
-    def _process_single_message(self, uid: int, folder_output: Path) -> tuple[str, int]:
+        If the previous run stored a sync state with the same UIDVALIDITY and
+        its output is still there, only messages changed since its
+        HIGHESTMODSEQ are returned (RFC 7162). Otherwise all messages are
+        returned, so an emptied or removed local folder is downloaded again.
         """
-        Process a single message.
+        if not self.client:
+            return []
+        previous = _load_sync_state(folder_output) if sync_state else None
+        if previous and previous.get("uidvalidity") == sync_state["uidvalidity"] and _has_local_messages(folder_output):
+            last_modseq = previous.get("highestmodseq")
+            if isinstance(last_modseq, int):
+                if last_modseq >= sync_state["highestmodseq"]:
+                    return []
+                return self.client.search(["MODSEQ", str(last_modseq + 1)])
+        return self.client.search(["ALL"])
+
+    def _filter_downloaded_messages(
+        self, messages: list, folder_output: Path, download_bodies: bool = True
+    ) -> tuple[list, int]:
+        """
+        Drop messages whose email.eml already exists with the server-reported size.
 
-        Returns: tuple of (status, attachment_count) where status is
-                 'downloaded', 'skipped', or 'error'
+        Only lightweight metadata (date, size, subject) is fetched, so unchanged
+        messages are never downloaded again. Skipped for fresh output folders.
+        With a tar archive_format, the indexes of earlier archives are compared
+        instead of files on disk, and headers-only runs also skip messages whose
+        headers.eml or email.eml is already archived.
+
+        Returns: (messages_to_download, skipped_count)
         """
         if not self.client:
-            return ("error", 0)
+            return messages, 0
+        if self.archive_format == "dir":
+            # One directory scan tells which messages can exist locally at all
+            with os.scandir(folder_output) as entries:
+                existing_dirs = {entry.name for entry in entries if entry.is_dir()}
+            is_stored = partial(self._is_already_downloaded, folder_output=folder_output, existing_dirs=existing_dirs)
+        else:
+            existing_dirs = _load_archived_members(folder_output, self.archive_format)
+            is_stored = partial(self._is_already_archived, archived=existing_dirs, download_bodies=download_bodies)
+        if not existing_dirs:
+            return messages, 0
+
+        to_download = []
         try:
-            raw_messages = self.client.fetch([uid], ["RFC822", "INTERNALDATE"])
+            for batch in _batched(messages, self.fetch_batch_size):
+                metadata = self.client.fetch(batch, METADATA_FETCH_ITEMS)
+                to_download.extend(uid for uid in batch if not is_stored(uid, metadata.get(uid)))
+        except IMAPClientError:
+            return messages, 0
+
+        return to_download, len(messages) - len(to_download)
 
-            if uid not in raw_messages:
-                return ("error", 0)
+    def _metadata_email_dir(self, uid: int, metadata: Optional[dict], folder_output: Path) -> Optional[Path]:
+        """Return the email directory a message's metadata maps to, or None if the metadata is incomplete."""
+        if not metadata or b"RFC822.SIZE" not in metadata or b"INTERNALDATE" not in metadata:
+            return None
 
-            raw_email = raw_messages[uid][b"RFC822"]
-            internal_date = raw_messages[uid].get(b"INTERNALDATE", datetime.now())
-            msg = email.message_from_bytes(raw_email)
+        header = next((value for key, value in metadata.items() if key.startswith(b"BODY[HEADER")), None)
+        msg = _HEADER_PARSER.parsebytes(header or b"")
+        return self._create_email_directory(msg, uid, metadata[b"INTERNALDATE"], folder_output)
+
+    def _is_already_downloaded(
+        self, uid: int, metadata: Optional[dict], folder_output: Path, existing_dirs: set[str]
+    ) -> bool:
+        """Check whether a message's email.eml exists locally with the same size."""
+        email_dir = self._metadata_email_dir(uid, metadata, folder_output)
+        if email_dir is None or email_dir.name not in existing_dirs:
+            return False
+        try:
+            return os.stat(email_dir / "email.eml").st_size == metadata[b"RFC822.SIZE"]
+        except OSError:
+            return False
 
-            email_dir = self._create_email_directory(msg, uid, internal_date, folder_output)
-            email_path = email_dir / "email.eml"
+    def _is_already_archived(
+        self, uid: int, metadata: Optional[dict], archived: dict[str, dict[str, int]], download_bodies: bool
+    ) -> bool:
+        """
+        Check whether an earlier archive of the folder holds the message.
 
-            # Check if email already exists with same size
-            if self._should_skip_email(email_path, raw_email):
-                return ("skipped", 0)
+        Full downloads compare the archived email.eml size. Headers-only runs
+        accept any archived copy by name, as RFC822.SIZE covers the body too.
+        """
+        email_dir = self._metadata_email_dir(uid, metadata, Path())
+        members = archived.get(email_dir.name) if email_dir else None
+        if not members:
+            return False
+        if not download_bodies:
+            return "headers.eml" in members or "email.eml" in members
+        return members.get("email.eml") == metadata[b"RFC822.SIZE"]
 
-            email_dir.mkdir(parents=True, exist_ok=True)
-            with open(email_path, "wb") as f:
-                f.write(raw_email)
+    def _download_messages(self, plan: _DownloadPlan, folder_name: str, folder_output: Path) -> tuple[int, int]:
+        """
+        Download all planned messages in batches with progress bar.
 
-            # Extract attachments
-            attachment_count = self._save_attachments(msg, email_dir)
-            return ("downloaded", attachment_count)
+        The sync state is stored for the next incremental run only if every
+        message was downloaded or skipped without error.
+        """
+        counts = {"downloaded": 0, "skipped": plan.emails_skipped, "error": 0}
+        attachments_downloaded = 0
+        fetch_items = BODY_FETCH_ITEMS if plan.download_bodies else HEADER_FETCH_ITEMS
 
+        with create_progress_bar() as progress:
+            task = progress.add_task(f"Downloading from {folder_name}...", total=len(plan.messages))
+
+            if self.archive_format == "dir":
+                results = self._persist_messages(plan.messages, folder_output, fetch_items)
+            else:
+                results = self._archive_messages(plan.messages, folder_output, fetch_items)
+
+            # Report progress once per fetch batch rather than per message
+            unreported = 0
+            for result, attach_count in results:
+                counts[result] += 1
+                attachments_downloaded += attach_count
+                unreported += 1
+                if unreported >= self.fetch_batch_size:
+                    progress.advance(task, unreported)
+                    unreported = 0
+            progress.advance(task, unreported)
+
+        if plan.sync_state and counts["error"] == 0:
+            _save_sync_state(folder_output, plan.sync_state)
+
+        self._show_download_summary(counts["downloaded"], attachments_downloaded, counts["skipped"])
+        return (counts["downloaded"], attachments_downloaded)
+
+    def _persist_messages(
+        self, messages: list, folder_output: Path, fetch_items: list[str]
+    ) -> Iterator[tuple[str, int]]:
+        """
+        Fetch messages and save them on a pool of writer threads.
+
+        Fetching stays on its own thread while parsing and disk writes run on
+        ``persist_workers`` threads. At most PERSIST_QUEUE_SIZE messages are held
+        in memory waiting to be written.
+
+        Yields: (status, attachment_count) for each message, in UID order
+        """
+        pending: deque[Future] = deque()
+        with ThreadPoolExecutor(max_workers=self.persist_workers) as writers:
+            for uid, data in self._iter_fetched_messages(messages, fetch_items):
+                pending.append(writers.submit(self._persist_message, uid, data, folder_output))
+                if len(pending) >= PERSIST_QUEUE_SIZE:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _archive_messages(
+        self, messages: list, folder_output: Path, fetch_items: list[str]
+    ) -> Iterator[tuple[str, int]]:
+        """
+        Fetch messages and stream them into a single compressed tar archive.
+
+        Each run writes a new timestamped archive in the folder output; every
+        message becomes one <email dir>/email.eml member with its attachments
+        left embedded, so no per-message directories or files are created.
+        Once the archive is closed, its member names and sizes are stored in
+        an index next to it for the already-downloaded check of later runs.
+
+        Yields: (status, attachment_count) for each message, in UID order
+        """
+        if not messages:
+            return
+        folder_output.mkdir(parents=True, exist_ok=True)
+        archive_path = folder_output / f"archive_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{self.archive_format}"
+        index: dict[str, int] = {}
+        # pylint: disable-next=contextmanager-generator-missing-cleanup
+        with _open_tar_archive(archive_path, self.archive_format) as tar:
+            for uid, data in self._iter_fetched_messages(messages, fetch_items):
+                if data is None:
+                    yield ("error", 0)
+                    continue
+                raw_email, _headers, email_path = self._unpack_message(uid, data, folder_output)
+                member = tarfile.TarInfo(email_path.relative_to(folder_output).as_posix())
+                member.size = len(raw_email)
+                member.mtime = int(data.get(b"INTERNALDATE", datetime.now()).timestamp())
+                tar.addfile(member, io.BytesIO(raw_email))
+                index[member.name] = member.size
+                yield ("downloaded", 0)
+        _save_archive_index(archive_path, index)
+
+    def _iter_fetched_messages(self, messages: list, fetch_items: list[str]) -> Iterator[tuple[int, Optional[dict]]]:
+        """
+        Yield (uid, data) for all messages, fetching them batch by batch.
+
+        The next batch is requested on a background thread while the current
+        one is being processed, so disk work overlaps with the network wait.
+        A single worker keeps all IMAP commands on the connection serialized.
+        """
+        with ThreadPoolExecutor(max_workers=1) as fetcher:
+            pending = None
+            for batch in _batched(messages, self.fetch_batch_size):
+                upcoming = fetcher.submit(self._fetch_batch, batch, fetch_items)
+                if pending is not None:
+                    yield from pending.result()
+                pending = upcoming
+            if pending is not None:
+                yield from pending.result()
+
+    def _fetch_batch(self, batch: list, fetch_items: list[str]) -> list[tuple[int, Optional[dict]]]:
+        """
+        Fetch a batch of messages with a single FETCH command.
+
+        Falls back to per-message fetches if the batch request fails, so a
+        single problematic message does not abort the whole batch.
+
+        Returns: list of (uid, data) where data is None if the fetch failed
+        """
+        if not self.client:
+            return [(uid, None) for uid in batch]
+        try:
+            raw_messages = self.client.fetch(batch, fetch_items)
+        except IMAPClientError:
+            return [(uid, self._fetch_single_message(uid, fetch_items)) for uid in batch]
+        return [(uid, raw_messages.get(uid)) for uid in batch]
+
+    def _fetch_single_message(self, uid: int, fetch_items: list[str]) -> Optional[dict]:
+        """Fetch a single message, returning None on error."""
+        if not self.client:
+            return None
+        try:
+            raw_messages = self.client.fetch([uid], fetch_items)
         except IMAPClientError as e:
             console.print(f"[red]Error processing message {uid}: {e}[/red]")
+            return None
+        return raw_messages.get(uid)
+
+    def _persist_message(self, uid: int, data: Optional[dict], folder_output: Path) -> tuple[str, int]:
+        """
+        Save an already fetched message and its attachments.
+
+        Messages fetched with HEADER_FETCH_ITEMS are saved as headers.eml
+        without attachment extraction.
+
+        Returns: tuple of (status, attachment_count) where status is
+                 'downloaded', 'skipped', or 'error'
+        """
+        if data is None:
             return ("error", 0)
 
+        raw_email, headers, email_path = self._unpack_message(uid, data, folder_output)
+        email_dir = email_path.parent
+
+        # Check if email already exists with same size
+        if self._should_skip_email(email_path, raw_email):
+            return ("skipped", 0)
+
+        email_dir.mkdir(parents=True, exist_ok=True)
+        _write_bytes(email_path, raw_email)
+
+        # Only multipart messages can carry attachments worth a full parse
+        if email_path.name == "headers.eml" or headers.get_content_maintype() != "multipart":
+            return ("downloaded", 0)
+        attachment_count = self._save_attachments(_MESSAGE_PARSER.parsebytes(raw_email), email_dir)
+        return ("downloaded", attachment_count)
+
+    def _unpack_message(self, uid: int, data: dict, folder_output: Path) -> tuple[bytes, Message, Path]:
+        """
+        Extract the raw message and its headers from fetched data.
+
+        Returns: (raw_email, headers, email_path) where email_path is
+                 headers.eml for headers-only fetches and email.eml otherwise
+        """
+        headers_only = b"RFC822" not in data
+        raw_email = data[b"BODY[HEADER]"] if headers_only else data[b"RFC822"]
+        internal_date = data.get(b"INTERNALDATE", datetime.now())
+        # Headers are enough for the directory name and skip check
+        headers = _HEADER_PARSER.parsebytes(raw_email)
+
+        email_dir = self._create_email_directory(headers, uid, internal_date, folder_output)
+        return (raw_email, headers, email_dir / ("headers.eml" if headers_only else "email.eml"))
+
     def _create_email_directory(self, msg, uid: int, internal_date: datetime, folder_output: Path) -> Path:
         """Create directory path for an email."""
         subject = decode_mime_header(msg.get("Subject", "No Subject"))
@@ -228,10 +796,10 @@ class MailArchiver:
 
     def _should_skip_email(self, email_path: Path, raw_email: bytes) -> bool:
         """Check if email should be skipped (same name and size)."""
-        if email_path.exists():
-            existing_size = email_path.stat().st_size
-            return existing_size == len(raw_email)
-        return False
+        try:
+            return os.stat(email_path).st_size == len(raw_email)
+        except FileNotFoundError:
+            return False
 
     def _save_attachments(self, msg, email_dir: Path) -> int:
         """Save attachments from an email. Returns count of attachments saved."""
@@ -241,8 +809,11 @@ class MailArchiver:
             return 0
 
         for part in msg.walk():
-            content_disposition = str(part.get("Content-Disposition", ""))
-            if "attachment" not in content_disposition and "inline" not in content_disposition:
+            # Containers never hold a payload of their own
+            if part.is_multipart():
+                continue
+
+            if part.get_content_disposition() not in ("attachment", "inline"):
                 continue
 
             filename = part.get_filename()
@@ -259,21 +830,119 @@ class MailArchiver:
         """Save a single attachment. Returns True if saved."""
         filename = decode_mime_header(filename)
         filename = sanitize_filename(filename)
-        attachment_path = email_dir / filename
+        if self.dedupe_attachments:
+            return self._save_deduplicated_attachment(part, filename, email_dir)
+        fd, attachment_path = self._create_unique_file(str(email_dir), filename)
+
+        with open(fd, "wb") as f:
+            written = self._write_payload(part, f)
+
+        if not written:
+            os.unlink(attachment_path)
+        return bool(written)
+
+    def _save_deduplicated_attachment(self, part, filename: str, email_dir: Path) -> bool:
+        """
+        Save an attachment as a hardlink to a content-addressed blob.
+
+        Blobs live in ATTACHMENT_STORE_DIR next to the folder directories,
+        named by the SHA-256 of the decoded payload, so an attachment repeated
+        across emails is written to disk only once. The store is never
+        uploaded; every email directory holds its own link to the data, so the
+        store can be deleted at any time (--delete-local does so after upload).
+        Falls back to a plain copy where the filesystem does not support
+        hardlinks.
+
+        Returns: True if saved
+        """
+        buffer = io.BytesIO()
+        if not self._write_payload(part, buffer):
+            return False
+        payload = buffer.getbuffer()
+
+        digest = hashlib.sha256(payload).hexdigest()
+        blob_path = email_dir.parent.parent / ATTACHMENT_STORE_DIR / digest[:2] / digest
+        if not blob_path.exists():
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temp file and rename it into place, so an interrupted
+            # write never leaves a truncated blob behind for later emails to link
+            fd, temp_path = tempfile.mkstemp(dir=blob_path.parent, prefix=".tmp-")
+            try:
+                with open(fd, "wb") as f:
+                    f.write(payload)
+                os.chmod(temp_path, 0o644)
+                os.replace(temp_path, blob_path)
+            finally:
+                with suppress(FileNotFoundError):
+                    os.unlink(temp_path)
+
+        paths = self._unique_paths(str(email_dir), filename)
+        try:
+            while True:
+                try:
+                    os.link(blob_path, next(paths))
+                    return True
+                except FileExistsError:
+                    continue
+        except OSError:
+            fd, _path = self._create_unique_file(str(email_dir), filename)
+            with open(fd, "wb") as f:
+                f.write(payload)
+        return True
 
-        # Handle duplicate filenames
+    @staticmethod
+    def _unique_paths(directory: str, filename: str) -> Iterator[str]:
+        """Yield the path for filename, then variants with _1, _2, ... appended."""
+        name, ext = os.path.splitext(filename)
+        yield os.path.join(directory, filename)
         counter = 1
-        while attachment_path.exists():
-            name, ext = os.path.splitext(filename)
-            attachment_path = email_dir / f"{name}_{counter}{ext}"
+        while True:
+            yield os.path.join(directory, f"{name}_{counter}{ext}")
             counter += 1
 
+    @classmethod
+    def _create_unique_file(cls, directory: str, filename: str) -> tuple[int, str]:
+        """
+        Exclusively create a new file, appending _1, _2, ... to taken names.
+
+        O_EXCL makes each attempt a single race-free syscall instead of an
+        exists() probe followed by open().
+
+        Returns: (file_descriptor, path)
+        """
+        paths = cls._unique_paths(directory, filename)
+        while True:
+            path = next(paths)
+            try:
+                return os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644), path
+            except FileExistsError:
+                continue
+
+    def _write_payload(self, part, f) -> int:
+        """
+        Decode a part's payload into an open file. Returns the number of bytes written.
+
+        Base64 and quoted-printable payloads are decoded straight into the
+        file instead of building the full decoded payload in memory first.
+        """
+        raw = part.get_payload(decode=False)
+        if not isinstance(raw, str) or not raw.strip():
+            return 0
+
+        decoder = _STREAMING_DECODERS.get(str(part.get("Content-Transfer-Encoding", "")).strip().lower())
+        if decoder is not None:
+            try:
+                decoder(io.BytesIO(raw.encode("ascii", "surrogateescape")), f)
+                return f.tell()
+            except (binascii.Error, UnicodeEncodeError):
+                # Malformed encoding: let the email package apply its lenient decoding
+                f.seek(0)
+                f.truncate()
+
         payload = part.get_payload(decode=True)
         if payload and isinstance(payload, bytes):
-            with open(attachment_path, "wb") as f:
-                f.write(payload)
-            return True
-        return False
+            return f.write(payload)
+        return 0
 
     def _show_download_summary(self, emails_downloaded: int, attachments_downloaded: int, emails_skipped: int):
         """Show download completion summary."""
@@ -326,7 +995,7 @@ class MailArchiver:
     def _test_inbox_access(self):
         """Test INBOX access."""
         console.print("[cyan]Testing INBOX access...[/cyan]")
-        select_info = self.client.select_folder("INBOX", readonly=True)
+        select_info = self._select_folder("INBOX", readonly=True)
         msg_count = select_info.get(b"EXISTS", 0)
         console.print(f"[green]✓ INBOX accessible ({msg_count} messages)[/green]")
 
@@ -379,7 +1048,7 @@ class MailArchiver:
         if not self.client:
             return None
         try:
-            select_info = self.client.select_folder(folder_name, readonly=False)
+            select_info = self._select_folder(folder_name, readonly=False)
             return select_info.get(b"EXISTS", 0)
         except IMAPClientError as e:
             console.print(f"[red]Error selecting folder '{folder_name}': {e}[/red]")
@@ -413,6 +1082,8 @@ class MailArchiver:
         console.print(f"Filter: [yellow]{filter_desc}[/yellow]")
         console.print(f"Total in folder: {total_messages}")
 
+        from rich.prompt import Confirm  # pylint: disable=import-outside-toplevel
+
         if not Confirm.ask("[red]Are you sure you want to delete these messages?[/red]"):
             console.print("[yellow]Deletion cancelled[/yellow]")
             return False
@@ -427,14 +1098,41 @@ class MailArchiver:
         """Execute the actual deletion of messages."""
         if not self.client:
             return 0
+        # With UIDPLUS each chunk is expunged by UID, leaving other \Deleted messages alone
+        uid_expunge = self.client.has_capability("UIDPLUS")
+
         with create_progress_bar() as progress:
             task = progress.add_task("Deleting messages...", total=len(messages))
 
-            self.client.delete_messages(messages)
-            progress.update(task, completed=len(messages) // 2)
+            for batch in _batched(messages, DELETE_BATCH_SIZE):
+                self._delete_batch(batch, uid_expunge)
+                progress.advance(task, len(batch))
 
-            self.client.expunge()
-            progress.update(task, completed=len(messages))
+            if not uid_expunge:
+                self.client.expunge()
+        # EXISTS changed, so the next SELECT must go to the server
+        self._selected = None
 
         console.print(f"[green]✓ Deleted {len(messages)} messages from '{folder_name}'[/green]")
         return len(messages)
+
+    def _delete_batch(self, batch: list, uid_expunge: bool) -> None:
+        """
+        Flag one batch of UIDs as deleted and expunge it by UID if requested.
+
+        Contiguous UIDs are sent as ranges to keep command lines short. A
+        scattered batch can still exceed the server's line limit; when the
+        server rejects the command as too long, each half is retried on its own.
+        Storing the flag again is harmless, so a half-applied batch is safe.
+        """
+        uid_set = _compact_uid_set(batch)
+        try:
+            self.client.delete_messages(uid_set, silent=True)
+            if uid_expunge:
+                self.client.uid_expunge(uid_set)
+        except IMAPClientError as e:
+            if len(batch) == 1 or "too long" not in str(e).lower():
+                raise
+            middle = len(batch) // 2
+            self._delete_batch(batch[:middle], uid_expunge)
+            self._delete_batch(batch[middle:], uid_expunge)
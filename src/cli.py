@@ -10,14 +10,11 @@ import os
 import sys
 from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
-from pathvalidate import sanitize_filename
-from rich.console import Console
-from rich.prompt import Prompt
-
-from .archiver import MailArchiver
+from .archiver import ATTACHMENT_STORE_DIR, MailArchiver
 from .config import (
     MailConfig,
     NASConfig,
@@ -26,12 +23,13 @@ from .config import (
     parse_time_range,
 )
 from .uploader import NASUploader
-from .utils import delete_directory
+from .utils import console, delete_directory, sanitize_filename
 
-console = Console()
+# NAS paths are configured with forward slashes but shown as UNC paths
+_SLASH_TO_BACKSLASH = str.maketrans("/", "\\")
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class DownloadOptions:
     """Options for downloading emails."""
 
@@ -41,20 +39,29 @@ class DownloadOptions:
     overwrite: bool
     clean: bool
     delete_local: bool
+    no_bodies: bool
+
+
+@dataclass(slots=True, frozen=True)
+class FolderTarget:
+    """Selected mail folder with its local directory name and NAS path."""
+
+    name: str
+    safe_name: str
+    nas_path: Optional[str]
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class UploadContext:
     """Context for NAS upload operation."""
 
     nas_config: NASConfig
-    mail_config: MailConfig
-    folder_name: str
+    nas_folder_path: str
     local_folder: Path
     emails_count: int
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class TestOptions:
     """Options for connection testing."""
 
@@ -62,7 +69,7 @@ class TestOptions:
     nas: bool
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ProviderOptions:
     """Options for mail provider configuration."""
 
@@ -70,7 +77,7 @@ class ProviderOptions:
     config_path: Optional[str]
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class CLIArgs:
     """Parsed command-line arguments."""
 
@@ -83,12 +90,7 @@ class CLIArgs:
     test: TestOptions
 
 
-def parse_args() -> CLIArgs:
-    """Parse command line arguments."""
-    parser = argparse.ArgumentParser(
-        description="Mail Archive Download Tool",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
+EXAMPLES_EPILOG = """
 Examples:
   %(prog)s --list                     List all mail folders
   %(prog)s --folder INBOX             Download INBOX folder locally
@@ -99,11 +101,24 @@ Examples:
   %(prog)s --test-mail                Test IMAP connection
   %(prog)s --test-nas                 Test NAS SMB connection
   %(prog)s --test-mail --test-nas     Test both connections
-        """,
-    )
+        """
 
+
+@lru_cache(maxsize=1)
+def _build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser once; parsing does not modify it."""
+    parser = argparse.ArgumentParser(
+        description="Mail Archive Download Tool",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=EXAMPLES_EPILOG,
+    )
     _add_arguments(parser)
-    args = parser.parse_args()
+    return parser
+
+
+def parse_args() -> CLIArgs:
+    """Parse command line arguments."""
+    args = _build_parser().parse_args()
 
     download_options = DownloadOptions(
         folder=args.folder,
@@ -112,6 +127,7 @@ Examples:
         overwrite=args.overwrite,
         clean=args.clean,
         delete_local=args.delete_local,
+        no_bodies=args.no_bodies,
     )
 
     test_options = TestOptions(
@@ -166,6 +182,11 @@ def _add_arguments(parser: argparse.ArgumentParser) -> None:
         action="store_true",
         help="Overwrite existing files on NAS (default: skip existing)",
     )
+    parser.add_argument(
+        "--no-bodies",
+        action="store_true",
+        help="Only download message headers (headers.eml), skip bodies and attachments",
+    )
     parser.add_argument(
         "--dry-run",
         "-n",
@@ -217,10 +238,25 @@ def _add_arguments(parser: argparse.ArgumentParser) -> None:
     )
 
 
+def _ask_folder_choice() -> str:
+    """Ask for a folder number; uses plain input() when stdin is not a terminal."""
+    prompt = "Enter folder number (or 'q' to quit)"
+    if sys.stdin.isatty():
+        from rich.prompt import Prompt  # pylint: disable=import-outside-toplevel
+
+        return Prompt.ask(f"\n{prompt}", default="1")
+
+    try:
+        return input(f"{prompt} [1]: ").strip() or "1"
+    except EOFError:
+        # Piped input ran out, stop asking
+        return "q"
+
+
 def select_folder_interactive(folders: list[tuple[str, str | int]]) -> Optional[str]:
     """Let user select a folder interactively."""
     while True:
-        choice = Prompt.ask("\nEnter folder number (or 'q' to quit)", default="1")
+        choice = _ask_folder_choice()
 
         if choice.lower() == "q":
             return None
@@ -234,15 +270,25 @@ def select_folder_interactive(folders: list[tuple[str, str | int]]) -> Optional[
             console.print("[red]Please enter a number or 'q' to quit.[/red]")
 
 
-def handle_nas_only_test(args: CLIArgs, nas_config: Optional[NASConfig]) -> None:
-    """Handle --test-nas without --test-mail."""
+def _print_nas_not_configured() -> None:
+    """Tell the user which environment variables configure the NAS."""
+    console.print("[red]Error: NAS credentials not configured[/red]")
+    console.print("Set NAS_HOST, NAS_SHARE, NAS_USERNAME, NAS_PASSWORD in your environment")
+
+
+def _test_nas_connection(args: CLIArgs, nas_config: Optional[NASConfig]) -> bool:
+    """Test the NAS connection, exiting with an error if NAS is not configured."""
     if nas_config is None:
-        console.print("[red]Error: NAS credentials not configured[/red]")
-        console.print("Set NAS_HOST, NAS_SHARE, NAS_USERNAME, NAS_PASSWORD in your environment")
+        _print_nas_not_configured()
         sys.exit(1)
 
     uploader = NASUploader(nas_config)
-    success = uploader.test_connection(dry_run=args.dry_run)
+    return uploader.test_connection(dry_run=args.dry_run)
+
+
+def handle_nas_only_test(args: CLIArgs, nas_config: Optional[NASConfig]) -> None:
+    """Handle --test-nas without --test-mail."""
+    success = _test_nas_connection(args, nas_config)
     sys.exit(0 if success else 1)
 
 
@@ -258,13 +304,7 @@ def handle_connection_tests(
         sys.exit(0 if mail_success else 1)
 
     # Also test NAS
-    if nas_config is None:
-        console.print("\n[red]Error: NAS credentials not configured[/red]")
-        console.print("Set NAS_HOST, NAS_SHARE, NAS_USERNAME, NAS_PASSWORD in your environment")
-        sys.exit(1)
-
-    uploader = NASUploader(nas_config)
-    nas_success = uploader.test_connection(dry_run=args.dry_run)
+    nas_success = _test_nas_connection(args, nas_config)
 
     # Summary
     console.print("\n[bold]Connection Test Summary[/bold]")
@@ -278,18 +318,14 @@ def handle_connection_tests(
 def validate_nas_before_download(
     args: CLIArgs,
     nas_config: Optional[NASConfig],
-    mail_config: MailConfig,
-    folder_name: str,
+    nas_folder_path: Optional[str],
 ) -> bool:
     """Validate NAS connection before downloading. Returns True if valid."""
-    if nas_config is None:
-        console.print("[red]Error: NAS credentials not configured[/red]")
-        console.print("Set NAS_HOST, NAS_SHARE, NAS_USERNAME, NAS_PASSWORD in your environment")
+    if nas_config is None or nas_folder_path is None:
+        _print_nas_not_configured()
         return False
 
-    folder_safe_name = sanitize_filename(folder_name)
-    nas_folder_path = nas_config.get_folder_path(mail_config.account_name, folder_safe_name)
-    nas_display_path = nas_folder_path.replace("/", "\\").lstrip("\\")
+    nas_display_path = nas_folder_path.translate(_SLASH_TO_BACKSLASH).lstrip("\\")
     console.print(f"[dim]NAS target: \\\\{nas_config.host}\\{nas_config.share}\\{nas_display_path}[/dim]")
 
     # Test NAS connection before downloading (unless dry-run)
@@ -307,20 +343,19 @@ def validate_nas_before_download(
 def handle_nas_upload(args: CLIArgs, context: UploadContext) -> bool:
     """Handle NAS upload after download. Returns True if successful."""
     if args.dry_run:
-        _show_nas_dry_run(context.nas_config, context.mail_config, context.folder_name, args)
+        _show_nas_dry_run(context.nas_config, context.nas_folder_path, args)
         return True
 
     if context.emails_count == 0:
         return False
 
-    folder_safe_name = sanitize_filename(context.folder_name)
-    nas_folder_path = context.nas_config.get_folder_path(context.mail_config.account_name, folder_safe_name)
     upload_config = NASConfig(
         host=context.nas_config.host,
         share=context.nas_config.share,
         username=context.nas_config.username,
         password=context.nas_config.password,
-        base_path=nas_folder_path,
+        base_path=context.nas_folder_path,
+        max_workers=context.nas_config.max_workers,
     )
     uploader = NASUploader(upload_config)
     files_uploaded, _ = uploader.upload_directory(
@@ -333,23 +368,18 @@ def handle_nas_upload(args: CLIArgs, context: UploadContext) -> bool:
         console.print(f"[dim]Cleaning up local files: {context.local_folder}[/dim]")
         if delete_directory(context.local_folder):
             console.print("[green]✓ Local files deleted[/green]")
+        # Attachment blobs are hardlinked into every folder that uses them,
+        # so dropping the shared store never loses data still on disk
+        delete_directory(context.local_folder.parent / ATTACHMENT_STORE_DIR)
 
     return upload_success
 
 
-def _show_nas_dry_run(
-    nas_config: Optional[NASConfig],
-    mail_config: MailConfig,
-    folder_name: str,
-    args: CLIArgs,
-) -> None:
+def _show_nas_dry_run(nas_config: NASConfig, nas_folder_path: str, args: CLIArgs) -> None:
     """Show dry run info for NAS upload."""
-    folder_safe_name = sanitize_filename(folder_name)
-    nas_host = nas_config.host if nas_config else "not-configured"
-    nas_share = nas_config.share if nas_config else "not-configured"
-    nas_path = nas_config.base_path if nas_config else "/mail-archive"
-    nas_full_path = f"{nas_path}/{mail_config.account_name}/{folder_safe_name}"
-    console.print(f"\n[cyan]DRY RUN: Would upload to NAS: \\\\{nas_host}\\{nas_share}{nas_full_path}[/cyan]")
+    console.print(
+        f"\n[cyan]DRY RUN: Would upload to NAS: \\\\{nas_config.host}\\{nas_config.share}{nas_folder_path}[/cyan]"
+    )
     console.print(f"[cyan]Overwrite existing: {'Yes' if args.download.overwrite else 'No (skip)'}[/cyan]")
     if args.download.delete_local:
         console.print("[cyan]Would delete local files after upload[/cyan]")
@@ -360,13 +390,14 @@ def handle_clean_operation(
     archiver: MailArchiver,
     folder_name: str,
     emails_count: int,
+    now: datetime,
 ) -> None:
-    """Handle --clean operation."""
+    """Handle --clean operation. --since is counted back from now."""
     since_date = None
     if args.download.since:
         try:
             delta = parse_time_range(args.download.since)
-            since_date = datetime.now() - delta
+            since_date = now - delta
         except ValueError as e:
             console.print(f"[red]Error: {e}[/red]")
             return
@@ -382,7 +413,7 @@ def handle_clean_operation(
         console.print("[yellow]Skipping clean: no emails were downloaded[/yellow]")
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SummaryData:
     """Data for final summary display."""
 
@@ -390,7 +421,7 @@ class SummaryData:
     attachments_count: int
     upload_success: bool
     nas_config: Optional[NASConfig]
-    output_path: Path
+    output_path: Path  # Already resolved to an absolute path
 
 
 def show_final_summary(args: CLIArgs, summary: SummaryData) -> None:
@@ -406,7 +437,7 @@ def show_final_summary(args: CLIArgs, summary: SummaryData) -> None:
     if show_nas and summary.nas_config:
         console.print(f"  Location: NAS ({summary.nas_config.host})")
     else:
-        console.print(f"  Location: {summary.output_path.absolute()}")
+        console.print(f"  Location: {summary.output_path}")
 
 
 def main():
@@ -457,6 +488,9 @@ def _execute_main_operation(
     nas_config: Optional[NASConfig],
 ) -> None:
     """Execute the main operation based on arguments."""
+    # Reference time for --since, shared by all branches of this run
+    now = datetime.now()
+
     # Handle connection tests
     if args.test.mail:
         handle_connection_tests(args, archiver, nas_config)
@@ -482,25 +516,34 @@ def _execute_main_operation(
         console.print(f"Available folders: {', '.join(folder_names)}")
         return
 
+    # Local directory name and NAS path for the folder, computed once
+    folder_safe_name = sanitize_filename(folder_name)
+    target = FolderTarget(
+        name=folder_name,
+        safe_name=folder_safe_name,
+        nas_path=nas_config.get_folder_path(mail_config.account_name, folder_safe_name) if nas_config else None,
+    )
+
     # Validate NAS before download if needed
-    if args.nas and not validate_nas_before_download(args, nas_config, mail_config, folder_name):
+    if args.nas and not validate_nas_before_download(args, nas_config, target.nas_path):
         return
 
     # Clean-only mode: delete emails without downloading
     if args.download.clean and args.download.since and not args.nas:
-        _clean_only(args, archiver, folder_name)
+        _clean_only(args, archiver, folder_name, now)
         return
 
     # Download and process
-    _download_and_process(args, archiver, mail_config, nas_config, folder_name)
+    _download_and_process(args, archiver, nas_config, target, now)
 
 
 def _clean_only(
     args: CLIArgs,
     archiver: MailArchiver,
     folder_name: str,
+    now: datetime,
 ) -> None:
-    """Clean emails from folder without downloading."""
+    """Clean emails from folder without downloading. --since is counted back from now."""
     console.print(f"\n[bold]Selected folder: [green]{folder_name}[/green][/bold]")
     console.print("[bold yellow]Clean-only mode (no download)[/bold yellow]")
 
@@ -508,7 +551,7 @@ def _clean_only(
     if args.download.since:
         try:
             delta = parse_time_range(args.download.since)
-            since_date = datetime.now() - delta
+            since_date = now - delta
             console.print(f"[yellow]Will delete emails older than: {since_date.strftime('%Y-%m-%d')}[/yellow]")
         except ValueError as e:
             console.print(f"[red]Error: {e}[/red]")
@@ -545,27 +588,27 @@ def _select_folder(
 def _download_and_process(
     args: CLIArgs,
     archiver: MailArchiver,
-    mail_config: MailConfig,
     nas_config: Optional[NASConfig],
-    folder_name: str,
+    target: FolderTarget,
+    now: datetime,
 ) -> None:
     """Download folder and handle NAS upload and cleanup."""
-    console.print(f"\n[bold]Selected folder: [green]{folder_name}[/green][/bold]")
+    console.print(f"\n[bold]Selected folder: [green]{target.name}[/green][/bold]")
 
     # Download emails
     output_path = Path(args.download.output)
-    emails_count, attachments_count = archiver.download_folder(folder_name, output_path, dry_run=args.dry_run)
+    emails_count, attachments_count = archiver.download_folder(
+        target.name, output_path, dry_run=args.dry_run, download_bodies=not args.download.no_bodies
+    )
 
-    folder_safe_name = sanitize_filename(folder_name)
-    local_folder = output_path / folder_safe_name
+    local_folder = output_path.joinpath(target.safe_name)
     upload_success = False
 
     # Upload to NAS if requested
-    if args.nas and nas_config:
+    if args.nas and nas_config and target.nas_path:
         context = UploadContext(
             nas_config=nas_config,
-            mail_config=mail_config,
-            folder_name=folder_name,
+            nas_folder_path=target.nas_path,
             local_folder=local_folder,
             emails_count=emails_count,
         )
@@ -573,7 +616,7 @@ def _download_and_process(
 
     # Clean folder if requested
     if args.download.clean:
-        handle_clean_operation(args, archiver, folder_name, emails_count)
+        handle_clean_operation(args, archiver, target.name, emails_count, now)
 
     # Summary
     summary = SummaryData(
@@ -581,7 +624,7 @@ def _download_and_process(
         attachments_count=attachments_count,
         upload_success=upload_success,
         nas_config=nas_config,
-        output_path=output_path,
+        output_path=output_path.resolve(),
     )
     show_final_summary(args, summary)
 
@@ -7,16 +7,56 @@ provider config loading, and time range parsing.
 
 import os
 import re
+import stat
 from dataclasses import dataclass
 from datetime import timedelta
+from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
 from typing import Optional
 
-import yaml
-from rich.console import Console
+from .utils import console
 
-console = Console()
+# Time range strings like 30D, 6M, 1Y, 2W
+_TIME_RANGE_RE = re.compile(r"^(\d+)([DdMmYyWw])$")
 
+# Unit -> (timedelta keyword, multiplier); months and years are approximated
+_UNIT_FACTORS = {
+    "D": ("days", 1),
+    "W": ("weeks", 1),
+    "M": ("days", 30),
+    "Y": ("days", 365),
+}
+
+# ${VAR} and ${VAR:-default} placeholders in provider config values
+_ENV_VAR_RE = re.compile(r"\$\{([^}:]+)(?::-([^}]*))?\}")
+
+# Accepted spellings of true for boolean environment variables
+_TRUE_VALUES = frozenset({"true", "1", "yes"})
+
+# Providers usable without a config file; callers get a copy of the entry
+_BUILTIN_PROVIDERS = MappingProxyType(
+    {
+        "gmx": {
+            "name": "GMX Mail",
+            "imap_host": "imap.gmx.net",
+            "imap_port": 993,
+            "ssl": True,
+        },
+        "gmail": {
+            "name": "Gmail",
+            "imap_host": "imap.gmail.com",
+            "imap_port": 993,
+            "ssl": True,
+        },
+        "outlook": {
+            "name": "Outlook",
+            "imap_host": "outlook.office365.com",
+            "imap_port": 993,
+            "ssl": True,
+        },
+    }
+)
 
 # Default config file locations
 CONFIG_PATHS = [
@@ -26,7 +66,22 @@ CONFIG_PATHS = [
 ]
 
 
-@dataclass
+# Parallel NAS uploads when NAS_MAX_WORKERS is not set
+DEFAULT_NAS_MAX_WORKERS = 8
+
+
+def _parse_max_workers(value: Optional[str]) -> int:
+    """Parse NAS_MAX_WORKERS, falling back to the default for missing or invalid values."""
+    if not value:
+        return DEFAULT_NAS_MAX_WORKERS
+    try:
+        return max(1, int(value))
+    except ValueError:
+        console.print(f"[yellow]Invalid NAS_MAX_WORKERS '{value}', using {DEFAULT_NAS_MAX_WORKERS}[/yellow]")
+        return DEFAULT_NAS_MAX_WORKERS
+
+
+@dataclass(slots=True)
 class NASConfig:
     """Configuration for NAS connection."""
 
@@ -35,26 +90,33 @@ class NASConfig:
     username: str
     password: str
     base_path: str = "/mail-archive"
+    max_workers: int = DEFAULT_NAS_MAX_WORKERS
 
     @classmethod
     def from_env(cls) -> Optional["NASConfig"]:
         """Load NAS configuration from environment variables."""
-        host = os.getenv("NAS_HOST")
-        share = os.getenv("NAS_SHARE")
-        username = os.getenv("NAS_USERNAME")
-        password = os.getenv("NAS_PASSWORD")
-        base_path = os.getenv("NAS_PATH", "/mail-archive")
-
-        if not all([host, share, username, password]):
+        env = os.environ
+        # Stop at the first missing variable; usually NAS_HOST when NAS is not used
+        host = env.get("NAS_HOST")
+        if not host:
+            return None
+        share = env.get("NAS_SHARE")
+        if not share:
+            return None
+        username = env.get("NAS_USERNAME")
+        if not username:
+            return None
+        password = env.get("NAS_PASSWORD")
+        if not password:
             return None
 
-        # All values are validated above, cast to str
         return cls(
-            host=str(host),
-            share=str(share),
-            username=str(username),
-            password=str(password),
-            base_path=base_path,
+            host=host,
+            share=share,
+            username=username,
+            password=password,
+            base_path=env.get("NAS_PATH", "/mail-archive"),
+            max_workers=_parse_max_workers(env.get("NAS_MAX_WORKERS")),
         )
 
     def get_folder_path(self, mail_account: str, folder_name: str) -> str:
@@ -106,7 +168,7 @@ def parse_time_range(time_str: str) -> timedelta:
     Raises:
         ValueError: If the format is invalid
     """
-    match = re.match(r"^(\d+)([DdMmYyWw])$", time_str.strip())
+    match = _TIME_RANGE_RE.match(time_str.strip())
     if not match:
         raise ValueError(
             f"Invalid time range format: '{time_str}'. "
@@ -114,17 +176,8 @@ def parse_time_range(time_str: str) -> timedelta:
         )
 
     value = int(match.group(1))
-    unit = match.group(2).upper()
-
-    if unit == "D":
-        return timedelta(days=value)
-    if unit == "W":
-        return timedelta(weeks=value)
-    if unit == "M":
-        return timedelta(days=value * 30)  # Approximate months
-    if unit == "Y":
-        return timedelta(days=value * 365)  # Approximate years
-    raise ValueError(f"Unknown time unit: {unit}")
+    kind, factor = _UNIT_FACTORS[match.group(2).upper()]
+    return timedelta(**{kind: value * factor})
 
 
 def load_provider_config(provider: str, config_path: Optional[Path] = None) -> dict:
@@ -138,64 +191,99 @@ def load_provider_config(provider: str, config_path: Optional[Path] = None) -> d
     Returns:
         dict with keys: name, imap_host, imap_port, ssl, description
     """
-    # Find config file
-    search_paths = [config_path] if config_path else CONFIG_PATHS
-    config_file = _find_config_file(search_paths)
+    providers_file = _find_providers_file(config_path)
 
-    if not config_file:
+    if providers_file is None:
         return _get_builtin_provider_config(provider)
 
-    return _load_provider_from_file(config_file, provider)
+    return _load_provider_from_file(providers_file, provider)
+
+
+@dataclass(frozen=True, slots=True)
+class ProvidersFile:
+    """
+    Contents of a providers config file that the tool uses.
+
+    Provider entries are kept as composed YAML nodes and only constructed
+    when requested, since a run uses one provider out of the whole catalog.
+    """
+
+    default: str
+    provider_nodes: dict
+
+    def get_provider(self, name: str) -> dict:
+        """Construct the configuration of one provider as a new dict."""
+        from yaml.constructor import SafeConstructor  # pylint: disable=import-outside-toplevel
 
+        return SafeConstructor().construct_document(self.provider_nodes[name])
 
-def _find_config_file(search_paths: list) -> Optional[Path]:
-    """Find the first existing config file from the search paths."""
+
+def _find_providers_file(config_path: Optional[Path]) -> Optional[ProvidersFile]:
+    """
+    Load the config file to use, parsing it again only after it has changed on disk.
+
+    Candidates are config_path if given, otherwise CONFIG_PATHS in order. A
+    candidate that is missing, not a regular file, or removed before it could
+    be read is skipped; None means the built-in providers apply.
+    """
+    search_paths = [config_path] if config_path else CONFIG_PATHS
     for path in search_paths:
-        if path and path.exists():
-            return path
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            continue
+        if not stat.S_ISREG(stat_result.st_mode):
+            continue
+        try:
+            return _parse_providers_file(str(path.resolve()), stat_result.st_mtime_ns, stat_result.st_size)
+        except FileNotFoundError:
+            continue
     return None
 
 
+@lru_cache(maxsize=8)
+def _parse_providers_file(path_key: str, mtime_ns: int, size: int) -> ProvidersFile:  # pylint: disable=unused-argument
+    """
+    Parse a providers YAML file, constructing only the default provider name.
+
+    The modification time and size are part of the cache key only, so an
+    edited file is parsed again instead of being served from the cache.
+    """
+    import yaml  # pylint: disable=import-outside-toplevel
+
+    # libyaml's C loader when PyYAML was built with it
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    with open(path_key, encoding="utf-8") as f:
+        root = yaml.compose(f, Loader=loader)
+
+    sections = _mapping_nodes(root)
+    default_node = sections.get("default")
+    default = yaml.constructor.SafeConstructor().construct_document(default_node) if default_node else "gmx"
+    return ProvidersFile(default=default, provider_nodes=_mapping_nodes(sections.get("providers")))
+
+
+def _mapping_nodes(node) -> dict:
+    """Map the scalar keys of a composed YAML mapping node to their value nodes."""
+    if node is None or node.id != "mapping":
+        return {}
+    return {key.value: value for key, value in node.value}
+
+
 def _get_builtin_provider_config(provider: str) -> dict:
     """Get built-in default configuration for known providers."""
-    defaults = {
-        "gmx": {
-            "name": "GMX Mail",
-            "imap_host": "imap.gmx.net",
-            "imap_port": 993,
-            "ssl": True,
-        },
-        "gmail": {
-            "name": "Gmail",
-            "imap_host": "imap.gmail.com",
-            "imap_port": 993,
-            "ssl": True,
-        },
-        "outlook": {
-            "name": "Outlook",
-            "imap_host": "outlook.office365.com",
-            "imap_port": 993,
-            "ssl": True,
-        },
-    }
-    if provider in defaults:
+    if provider in _BUILTIN_PROVIDERS:
         console.print(f"[dim]Using built-in defaults for {provider}[/dim]")
-        return defaults[provider]
+        return dict(_BUILTIN_PROVIDERS[provider])
     raise ValueError(f"Unknown provider '{provider}' and no config file found")
 
 
-def _load_provider_from_file(config_file: Path, provider: str) -> dict:
-    """Load provider configuration from a YAML file."""
-    with open(config_file, encoding="utf-8") as f:
-        config = yaml.safe_load(f)
-
-    providers = config.get("providers", {})
-
-    if provider not in providers:
-        available = ", ".join(providers.keys())
+def _load_provider_from_file(providers_file: ProvidersFile, provider: str) -> dict:
+    """Load provider configuration from a parsed providers file."""
+    if provider not in providers_file.provider_nodes:
+        available = ", ".join(providers_file.provider_nodes.keys())
         raise ValueError(f"Unknown provider '{provider}'. Available: {available}")
 
-    provider_config = providers[provider]
+    provider_config = providers_file.get_provider(provider)
 
     # Handle custom provider with environment variable substitution
     if provider == "custom":
@@ -207,21 +295,30 @@ def _load_provider_from_file(config_file: Path, provider: str) -> dict:
 
 def _apply_custom_provider_env(provider_config: dict) -> dict:
     """Apply environment variable substitution for custom provider."""
-    provider_config["imap_host"] = os.getenv("IMAP_HOST", provider_config.get("imap_host", ""))
-    provider_config["imap_port"] = int(os.getenv("IMAP_PORT", provider_config.get("imap_port", 993)))
-    ssl_env = os.getenv("IMAP_SSL", str(provider_config.get("ssl", True)))
-    provider_config["ssl"] = ssl_env.lower() in ("true", "1", "yes")
+    env = os.environ
+    host = env.get("IMAP_HOST")
+    provider_config["imap_host"] = host if host is not None else _expand_env(provider_config.get("imap_host", ""))
+    port = env.get("IMAP_PORT")
+    provider_config["imap_port"] = int(port if port is not None else _expand_env(provider_config.get("imap_port", 993)))
+    ssl_value = env.get("IMAP_SSL")
+    if ssl_value is None:
+        ssl_value = str(_expand_env(provider_config.get("ssl", True)))
+    provider_config["ssl"] = ssl_value.lower() in _TRUE_VALUES
     return provider_config
 
 
+def _expand_env(value):
+    """Expand ${VAR} and ${VAR:-default} placeholders in a config value."""
+    if not isinstance(value, str) or "$" not in value:
+        return value
+    return _ENV_VAR_RE.sub(lambda match: os.environ.get(match.group(1), match.group(2) or ""), value)
+
+
 def get_default_provider(config_path: Optional[Path] = None) -> str:
     """Get the default provider from config, or 'gmx' if not found."""
-    search_paths = [config_path] if config_path else CONFIG_PATHS
+    providers_file = _find_providers_file(config_path)
 
-    for path in search_paths:
-        if path and path.exists():
-            with open(path, encoding="utf-8") as f:
-                config = yaml.safe_load(f)
-                return config.get("default", "gmx")
+    if providers_file is None:
+        return "gmx"
 
-    return "gmx"
+    return providers_file.default
@@ -5,19 +5,29 @@ Provides the NASUploader class for uploading files to a NAS
 using the SMB protocol.
 """
 
-from dataclasses import dataclass
+import errno
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
 from typing import TYPE_CHECKING, Any
 
-from rich.console import Console
-
 from .config import NASConfig
-from .utils import create_progress_bar
+from .utils import console, create_progress_bar
 
 if TYPE_CHECKING:
-    from collections.abc import Callable
+    from collections.abc import Callable, Iterator
 
-console = Console()
+# Copy uploads in 4 MiB chunks so memory stays bounded regardless of file size.
+# smbclient clamps each write to the negotiated max write size and requests
+# enough credits for the rest, so large chunks ramp up to multi-credit writes.
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+# Advance the progress bar in steps rather than once per file
+PROGRESS_BATCH_SIZE = 16
+# Map forward slashes in configured paths to SMB separators
+_SLASH_TABLE = str.maketrans("/", "\\")
 
 
 @dataclass
@@ -27,34 +37,57 @@ class FileUploadContext:
     smbclient: Any
     local_path: Path
     overwrite: bool
-    created_dirs: set
+    remote_listings: dict = field(default_factory=dict)
 
 
-@dataclass
-class _SMBClientCache:
-    """Cache holder for lazy-loaded smbclient module."""
+# SMB sessions registered in this process, keyed by (host, username).
+# smbclient keeps sessions in a process-wide pool, so uploaders built for other
+# base paths on the same NAS reuse the session instead of registering again.
+_registered_sessions: set[tuple[str, str]] = set()
+_sessions_lock = threading.Lock()
 
-    module: Any = None
+# One reusable copy buffer per upload worker thread
+_upload_buffers = threading.local()
 
 
-_smb_cache = _SMBClientCache()
+def _get_upload_buffer() -> memoryview:
+    """Return this thread's upload buffer, allocating it on first use."""
+    view = getattr(_upload_buffers, "view", None)
+    if view is None:
+        view = memoryview(bytearray(UPLOAD_CHUNK_SIZE))
+        _upload_buffers.view = view
+    return view
 
 
+@lru_cache(maxsize=1)
 def _get_smbclient():
-    """Lazy load smbclient module."""
-    if _smb_cache.module is None:
-        try:
-            import smbclient  # pylint: disable=import-outside-toplevel
+    """
+    Lazy load smbclient module.
 
-            _smb_cache.module = smbclient
-        except ImportError as err:
-            raise ImportError("smbprotocol not installed. Run: pip install smbprotocol") from err
-    return _smb_cache.module
+    smbprotocol takes about as long to import as the rest of the CLI, so it is
+    only loaded once an upload or connection test needs it. lru_cache keeps the
+    module after the first successful import; a failed import is retried.
+    """
+    try:
+        import smbclient  # pylint: disable=import-outside-toplevel
+    except ImportError as err:
+        raise ImportError("smbprotocol not installed. Run: pip install smbprotocol") from err
+    return smbclient
 
 
-class NASUploader:
+class NASUploader:  # pylint: disable=too-many-instance-attributes
     """Upload files to QNAP NAS via SMB."""
 
+    __slots__ = (
+        "_remote_prefix",
+        "base_path",
+        "host",
+        "max_workers",
+        "password",
+        "share",
+        "username",
+    )
+
     def __init__(self, config: NASConfig):
         """
         Initialize NASUploader with configuration.
@@ -66,8 +99,20 @@ class NASUploader:
         self.share = config.share
         self.username = config.username
         self.password = config.password
-        # Normalize path: strip slashes and convert forward slashes to backslashes
-        self.base_path = config.base_path.strip("/").replace("/", "\\").rstrip("\\")
+        # Normalize path: backslash separators, no leading, trailing or repeated ones
+        self.base_path = "\\".join(part for part in config.base_path.translate(_SLASH_TABLE).split("\\") if part)
+        self.max_workers = max(1, config.max_workers)
+        # UNC prefix for uploaded files, built once instead of per file
+        share_root = f"\\\\{self.host}\\{self.share}\\"
+        self._remote_prefix = f"{share_root}{self.base_path}\\" if self.base_path else share_root
+
+    def _ensure_session(self, smbclient) -> None:
+        """Register the SMB session on first use and reuse it for later calls and uploaders."""
+        key = (self.host, self.username)
+        with _sessions_lock:
+            if key not in _registered_sessions:
+                smbclient.register_session(self.host, username=self.username, password=self.password)
+                _registered_sessions.add(key)
 
     def _ensure_directory_exists(self, remote_dir: str, makedirs_func: "Callable") -> None:
         """
@@ -80,8 +125,9 @@ class NASUploader:
         try:
             makedirs_func(remote_dir, exist_ok=True)
         except OSError as e:
-            # If makedirs fails, try creating directories one level at a time
-            if "No such file" in str(e) or "0xc000003a" in str(e):
+            # If makedirs fails, try creating directories one level at a time.
+            # SMBOSError maps STATUS_OBJECT_PATH_NOT_FOUND (0xc000003a) to ENOENT.
+            if e.errno == errno.ENOENT:
                 self._create_directories_incrementally(remote_dir, makedirs_func)
 
     def _create_directories_incrementally(self, remote_dir: str, makedirs_func: "Callable") -> None:
@@ -122,13 +168,26 @@ class NASUploader:
 
         return self._execute_upload(smbclient, local_path, files_to_upload, overwrite)
 
-    def _collect_files(self, local_path: Path) -> tuple[list[Path], int]:
-        """Collect files to upload and calculate total size."""
-        files_to_upload = [f for f in local_path.rglob("*") if f.is_file()]
-        total_size = sum(f.stat().st_size for f in files_to_upload)
+    def _collect_files(self, local_path: Path) -> tuple[list[tuple[Path, int]], int]:
+        """Collect files to upload with their sizes and calculate total size."""
+        # Group files by directory so uploads walk each remote directory in turn
+        files_to_upload = sorted(self._scan_files(local_path), key=lambda item: (item[0].parent, item[0].name))
+        total_size = sum(size for _, size in files_to_upload)
         return files_to_upload, total_size
 
-    def _show_upload_dry_run(self, files_to_upload: list[Path], total_size: int, overwrite: bool) -> tuple[int, int]:
+    @staticmethod
+    def _scan_files(root: Path) -> "Iterator[tuple[Path, int]]":
+        """Yield (path, size) for every regular file below root in a single scandir pass."""
+        pending = [root]
+        while pending:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(Path(entry.path))
+                    elif entry.is_file():
+                        yield Path(entry.path), entry.stat().st_size
+
+    def _show_upload_dry_run(self, files_to_upload: list[tuple[Path, int]], total_size: int, overwrite: bool) -> tuple[int, int]:
         """Display dry run information."""
         console.print("\n[cyan]DRY RUN MODE - Would upload:[/cyan]")
         console.print(f"Files: [yellow]{len(files_to_upload)}[/yellow]")
@@ -141,12 +200,12 @@ class NASUploader:
         self,
         smbclient,
         local_path: Path,
-        files_to_upload: list[Path],
+        files_to_upload: list[tuple[Path, int]],
         overwrite: bool,
     ) -> tuple[int, int]:
         """Execute the actual upload to NAS."""
         try:
-            smbclient.register_session(self.host, username=self.username, password=self.password)
+            self._ensure_session(smbclient)
             self._create_base_directory(smbclient)
 
             return self._upload_files_with_progress(smbclient, local_path, files_to_upload, overwrite)
@@ -165,35 +224,66 @@ class NASUploader:
         self,
         smbclient,
         local_path: Path,
-        files_to_upload: list[Path],
+        files_to_upload: list[tuple[Path, int]],
         overwrite: bool,
     ) -> tuple[int, int]:
-        """Upload files with progress bar."""
-        files_uploaded = 0
-        files_skipped = 0
+        """Upload files with progress bar, running up to ``max_workers`` uploads in parallel."""
+        counts = {"uploaded": 0, "skipped": 0, "error": 0}
         total_size = 0
-        created_dirs: set[str] = set()
         ctx = FileUploadContext(
             smbclient=smbclient,
             local_path=local_path,
             overwrite=overwrite,
-            created_dirs=created_dirs,
         )
+        # Create remote directories serially so the workers only write files
+        self._create_remote_directories(ctx, files_to_upload)
 
-        with create_progress_bar() as progress:
+        with create_progress_bar() as progress, ThreadPoolExecutor(max_workers=self.max_workers) as executor:
             task = progress.add_task("Uploading to NAS...", total=len(files_to_upload))
+            futures = {executor.submit(self._upload_single_file, ctx, f): size for f, size in files_to_upload}
 
-            for local_file in files_to_upload:
-                result = self._upload_single_file(ctx, local_file)
+            pending = 0
+            for future in as_completed(futures):
+                result = future.result()
+                counts[result] += 1
                 if result == "uploaded":
-                    files_uploaded += 1
-                    total_size += local_file.stat().st_size
-                elif result == "skipped":
-                    files_skipped += 1
-                progress.advance(task)
+                    total_size += futures[future]
+                pending += 1
+                if pending == PROGRESS_BATCH_SIZE:
+                    progress.advance(task, pending)
+                    pending = 0
+            if pending:
+                progress.advance(task, pending)
+
+        self._show_upload_summary(counts["uploaded"], counts["skipped"])
+        return (counts["uploaded"], total_size)
+
+    def _create_remote_directories(self, ctx: FileUploadContext, files_to_upload: list[tuple[Path, int]]) -> None:
+        """
+        Create the remote directory tree for all files in one pass before uploading.
+
+        makedirs creates missing parents, so it is only called for the deepest
+        directories; every directory holding files is then listed once.
+        """
+        remote_dirs = {self._get_parent_directory(self._get_remote_path(ctx, f)) for f, _ in files_to_upload}
+        share_root = f"\\\\{self.host}\\{self.share}"
+        ancestors: set[str] = set()
+        for remote_dir in remote_dirs:
+            parent = self._get_parent_directory(remote_dir)
+            while len(parent) > len(share_root) and parent not in ancestors:
+                ancestors.add(parent)
+                parent = self._get_parent_directory(parent)
+
+        for remote_dir in sorted(remote_dirs - ancestors):
+            self._ensure_directory_exists(remote_dir, ctx.smbclient.makedirs)
+        if not ctx.overwrite:
+            for remote_dir in sorted(remote_dirs):
+                ctx.remote_listings[remote_dir] = self._list_remote_directory(ctx.smbclient, remote_dir)
 
-        self._show_upload_summary(files_uploaded, files_skipped)
-        return (files_uploaded, total_size)
+    def _get_remote_path(self, ctx: FileUploadContext, local_file: Path) -> str:
+        """Build the UNC path of a local file on the NAS."""
+        relative_path = local_file.relative_to(ctx.local_path).as_posix()
+        return self._remote_prefix + relative_path.replace("/", "\\")
 
     def _upload_single_file(
         self,
@@ -201,16 +291,10 @@ class NASUploader:
         local_file: Path,
     ) -> str:
         """Upload a single file. Returns 'uploaded', 'skipped', or 'error'."""
-        relative_path = local_file.relative_to(ctx.local_path)
-        remote_path = f"\\\\{self.host}\\{self.share}\\{self.base_path}\\{relative_path}"
-        remote_path = remote_path.replace("/", "\\")
+        remote_path = self._get_remote_path(ctx, local_file)
 
         remote_dir = self._get_parent_directory(remote_path)
-        if remote_dir not in ctx.created_dirs:
-            self._ensure_directory_exists(remote_dir, ctx.smbclient.makedirs)
-            ctx.created_dirs.add(remote_dir)
-
-        if not ctx.overwrite and self._file_exists_on_nas(ctx.smbclient, remote_path):
+        if not ctx.overwrite and self._file_exists_on_nas(ctx, remote_dir, remote_path):
             return "skipped"
 
         return self._write_file_to_nas(ctx.smbclient, local_file, remote_path)
@@ -222,20 +306,34 @@ class NASUploader:
             return remote_path[:last_sep]
         return remote_path
 
-    def _file_exists_on_nas(self, smbclient, remote_path: str) -> bool:
-        """Check if a file exists on the NAS."""
+    def _file_exists_on_nas(self, ctx: FileUploadContext, remote_dir: str, remote_path: str) -> bool:
+        """Check if a file exists on the NAS using one cached listing per remote directory."""
+        if remote_dir not in ctx.remote_listings:
+            ctx.remote_listings[remote_dir] = self._list_remote_directory(ctx.smbclient, remote_dir)
+        return remote_path.rpartition("\\")[2] in ctx.remote_listings[remote_dir]
+
+    def _list_remote_directory(self, smbclient, remote_dir: str) -> set[str]:
+        """
+        List the names in a remote directory.
+
+        Names are compared exactly: folding case would skip a new report.pdf
+        next to Report.pdf on a case-sensitive share (e.g. Samba with
+        case sensitive = yes), so it would never be uploaded.
+        """
         try:
-            smbclient.stat(remote_path)
-            return True
+            return set(smbclient.listdir(remote_dir))
         except OSError:
-            return False
+            return set()
 
     def _write_file_to_nas(self, smbclient, local_file: Path, remote_path: str) -> str:
         """Write a file to the NAS. Returns 'uploaded' or 'error'."""
         try:
-            with open(local_file, "rb") as src:
+            view = _get_upload_buffer()
+            # Unbuffered reads go straight into the reused buffer without an extra copy
+            with open(local_file, "rb", buffering=0) as src:
                 with smbclient.open_file(remote_path, mode="wb") as dst:
-                    dst.write(src.read())
+                    while read := src.readinto(view):
+                        dst.write(view[:read])
             return "uploaded"
         except OSError as e:
             console.print(f"[red]Failed to upload {local_file.name}: {e}[/red]")
@@ -295,7 +393,7 @@ class NASUploader:
     def _test_smb_session(self, smbclient) -> None:
         """Test SMB session establishment."""
         console.print("[cyan]Testing SMB session...[/cyan]")
-        smbclient.register_session(self.host, username=self.username, password=self.password)
+        self._ensure_session(smbclient)
         console.print("[green]✓ SMB session established[/green]")
 
     def _test_share_access(self, smbclient) -> None:
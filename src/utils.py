@@ -4,8 +4,11 @@ Utility functions for the mail archive tool.
 Provides common functions for MIME decoding and file operations.
 """
 
+import re
 import shutil
+import sys
 from email.header import decode_header
+from functools import lru_cache
 from pathlib import Path
 
 from rich.console import Console
@@ -17,14 +20,43 @@ from rich.progress import (
     TextColumn,
 )
 
-console = Console()
+
+def _create_console() -> Console:
+    """Create the console shared by all modules; plain output when stdout is not a terminal."""
+    if sys.stdout.isatty():
+        return Console()
+    return Console(no_color=True, highlight=False)
+
+
+console = _create_console()
+
+
+# Subjects and attachment names repeat a lot across a mailbox
+# (e.g. "image001.png", "Re: ..."), so decoded results are cached
+_CACHE_SIZE = 4096
 
 
 def decode_mime_header(header_value: str) -> str:
     """Decode a MIME-encoded header value."""
     if header_value is None:
         return ""
+    if isinstance(header_value, str):
+        # Without an encoded word decode_header returns the value unchanged
+        if "=?" not in header_value:
+            return header_value
+        return _decode_mime_header_cached(header_value)
+    # email.header.Header objects are not hashable
+    return _decode_mime_header(header_value)
+
 
+@lru_cache(maxsize=_CACHE_SIZE)
+def _decode_mime_header_cached(header_value: str) -> str:
+    """Cached variant of _decode_mime_header for plain string values."""
+    return _decode_mime_header(header_value)
+
+
+def _decode_mime_header(header_value) -> str:
+    """Decode all parts of a header value and join them."""
     decoded_parts = []
     for part, encoding in decode_header(header_value):
         if isinstance(part, bytes):
@@ -38,6 +70,43 @@ def decode_mime_header(header_value: str) -> str:
     return "".join(decoded_parts)
 
 
+# Names made only of these characters are already valid filenames, unless they
+# have leading/trailing whitespace, a trailing period, a reserved stem or are too long
+_PLAIN_FILENAME_RE = re.compile(r"[\w\-.,;()\[\]{}@#&+=!'~%$^ ]+")
+_MAX_FILENAME_BYTES = 255
+
+
+@lru_cache(maxsize=1)
+def _reserved_filenames() -> frozenset[str]:
+    """Reserved names (CON, NUL, ...) as known to pathvalidate, imported on first use."""
+    from pathvalidate import FileNameValidator  # pylint: disable=import-outside-toplevel
+
+    return frozenset(FileNameValidator(platform="universal").reserved_keywords)
+
+
+def _is_plain_filename(filename: str) -> bool:
+    """Check if pathvalidate would return the filename unchanged, without calling it."""
+    if not _PLAIN_FILENAME_RE.fullmatch(filename):
+        return False
+    if filename[0] == " " or filename[-1] in " .":
+        return False
+    if len(filename.encode("utf-8")) > _MAX_FILENAME_BYTES:
+        return False
+    stems = {filename.partition(".")[0].upper(), filename.rpartition(".")[0].upper()}
+    return _reserved_filenames().isdisjoint(stems)
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def sanitize_filename(filename: str) -> str:
+    """Make a string safe to use as a file or directory name (cached)."""
+    if filename and _is_plain_filename(filename):
+        return filename
+
+    from pathvalidate import sanitize_filename as _sanitize_filename  # pylint: disable=import-outside-toplevel
+
+    return _sanitize_filename(filename)
+
+
 def delete_directory(path: Path) -> bool:
     """
     Delete a directory and all its contents.
@@ -66,4 +135,5 @@ def create_progress_bar() -> Progress:
         BarColumn(),
         TaskProgressColumn(),
         console=console,
+        refresh_per_second=4,
     )
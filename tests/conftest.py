@@ -2,13 +2,25 @@
 Pytest fixtures and configuration for mail archive tests.
 """
 
+import io
+import os
 from email import encoders
 from email.mime.base import MIMEBase
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import pytest
+import yaml
+
+from src.config import NASConfig
+from src.uploader import _registered_sessions
+
+# Parse with libyaml when available, like the production loader
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)  # pylint: disable=invalid-name
+
+CONFIG_YAML_PATH = Path(__file__).resolve().parent.parent / "config" / "providers.yaml"
 
 
 @pytest.fixture
@@ -34,13 +46,16 @@ def mock_imap_client():
         b"UIDVALIDITY": 12345,
     }
 
+    # Mock folder_status
+    client.folder_status.return_value = {b"MESSAGES": 5}
+
     # Mock search
     client.search.return_value = [1, 2, 3, 4, 5]
 
     return client
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_email_simple():
     """Create a simple email without attachments."""
     msg = MIMEText("This is a test email body.")
@@ -51,7 +66,7 @@ def sample_email_simple():
     return msg.as_bytes()
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_email_with_attachment():
     """Create an email with an attachment."""
     msg = MIMEMultipart()
@@ -74,7 +89,7 @@ def sample_email_with_attachment():
     return msg.as_bytes()
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_email_mime_encoded():
     """Create an email with MIME-encoded headers."""
     msg = MIMEText("Email with special characters in subject.")
@@ -85,6 +100,14 @@ def sample_email_mime_encoded():
     return msg.as_bytes()
 
 
+@pytest.fixture(autouse=True)
+def reset_smb_sessions():
+    """Forget SMB sessions registered by earlier tests."""
+    _registered_sessions.clear()
+    yield
+    _registered_sessions.clear()
+
+
 @pytest.fixture
 def mock_smb_session():
     """Create mock SMB session functions."""
@@ -107,6 +130,42 @@ def mock_smb_session():
         }
 
 
+@pytest.fixture
+def fake_smb_open():
+    """Stand in for smbclient.open_file with a fresh in-memory buffer per call."""
+
+    def _open(*_args, **_kwargs):
+        return io.BytesIO()
+
+    return _open
+
+
+@pytest.fixture(scope="class")
+def nas_config():
+    """NAS configuration shared by tests that only read it."""
+    return NASConfig(
+        host="nas.local",
+        share="backup",
+        username="admin",
+        password="secret",
+        base_path="/mail-archive",
+    )
+
+
+@pytest.fixture
+def env(monkeypatch):
+    """Replace the whole process environment with the given variables for one test."""
+
+    def _set(variables: dict) -> None:
+        # Edit os.environ in place so it stays an os._Environ synced with the process
+        for name in list(os.environ):
+            monkeypatch.delenv(name)
+        for name, value in variables.items():
+            monkeypatch.setenv(name, value)
+
+    return _set
+
+
 @pytest.fixture
 def temp_download_dir(tmp_path):
     """Create a temporary download directory."""
@@ -130,3 +189,41 @@ def temp_upload_dir(tmp_path):
     (subdir / "nested_file.txt").write_text("Nested content")
 
     return upload_dir
+
+
+@pytest.fixture(scope="session")
+def gmx_config_file(tmp_path_factory):
+    """Write a providers config containing only GMX, shared by read-only tests."""
+    config_file = tmp_path_factory.mktemp("gmx_config") / "providers.yaml"
+    config_file.write_text(
+        "providers:\n"
+        "  gmx:\n"
+        "    name: GMX Mail\n"
+        "    imap_host: imap.gmx.net\n"
+        "    imap_port: 993\n"
+        "    ssl: true\n"
+        "default: gmx\n"
+    )
+    return config_file
+
+
+@pytest.fixture(scope="session")
+def custom_config_file(tmp_path_factory):
+    """Write a providers config with a custom provider, shared by read-only tests."""
+    config_file = tmp_path_factory.mktemp("custom_config") / "providers.yaml"
+    config_file.write_text(
+        "providers:\n"
+        "  custom:\n"
+        "    name: Custom\n"
+        "    imap_host: mail.test.com\n"
+        "    imap_port: 993\n"
+        "    ssl: true\n"
+    )
+    return config_file
+
+
+@pytest.fixture(scope="session")
+def providers_config():
+    """Parse the shipped config/providers.yaml once for all structure tests."""
+    with open(CONFIG_YAML_PATH, encoding="utf-8") as f:
+        return yaml.load(f, Loader=YAML_LOADER)
@@ -2,14 +2,25 @@
 Tests for MailArchiver class.
 """
 
+# pylint: disable=too-many-lines
+
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tarfile
+import zlib
 from datetime import datetime
 from email.mime.base import MIMEBase
 from email.mime.multipart import MIMEMultipart
 from unittest.mock import MagicMock, patch
 
+import pytest
 from imapclient.exceptions import IMAPClientError
 
-from src.archiver import MailArchiver
+from src.archiver import MailArchiver, _compact_uid_set, _enable_deflate
 
 # Test provider config that mimics GMX settings
 TEST_PROVIDER_CONFIG = {
@@ -91,6 +102,71 @@ class TestMailArchiverConnection:
         archiver.disconnect()
 
 
+class TestMailArchiverCompression:
+    """Tests for COMPRESS=DEFLATE support."""
+
+    def test_enable_deflate_wraps_connection(self):
+        """After COMPRESS, traffic should be deflated in both directions."""
+        client_sock, server_sock = socket.socketpair()
+        imap = MagicMock()
+        imap.sock = client_sock
+        imap._simple_command.return_value = ("OK", [b"DEFLATE active"])  # pylint: disable=protected-access
+
+        try:
+            assert _enable_deflate(imap) is True
+
+            imap.send(b"a1 NOOP\r\n")
+            inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+            assert inflater.decompress(server_sock.recv(1024)) == b"a1 NOOP\r\n"
+
+            deflater = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+            server_sock.sendall(deflater.compress(b"a1 OK NOOP done\r\n") + deflater.flush(zlib.Z_SYNC_FLUSH))
+            assert imap.file.readline() == b"a1 OK NOOP done\r\n"
+        finally:
+            client_sock.close()
+            server_sock.close()
+
+    def test_enable_deflate_rejected(self):
+        """A rejected COMPRESS should leave the connection untouched."""
+        imap = MagicMock()
+        imap._simple_command.return_value = ("NO", [b"not supported"])  # pylint: disable=protected-access
+        original_file = imap.file
+
+        assert _enable_deflate(imap) is False
+        assert imap.file is original_file
+
+    @patch("src.archiver._enable_deflate")
+    @patch("src.archiver.IMAPClient")
+    def test_connect_skips_compression_by_default(self, mock_imap_class, mock_enable_deflate):
+        """Without compress: true in the provider config COMPRESS should not be attempted."""
+        mock_imap_class.return_value = MagicMock()
+
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+        assert archiver.connect() is True
+
+        mock_enable_deflate.assert_not_called()
+
+    @patch("src.archiver._enable_deflate", return_value=True)
+    @patch("src.archiver.IMAPClient")
+    def test_connect_enables_compression_when_configured(self, mock_imap_class, mock_enable_deflate):
+        """compress: true should negotiate COMPRESS when the server advertises it."""
+        client = MagicMock()
+        client.has_capability.return_value = True
+        mock_imap_class.return_value = client
+
+        archiver = MailArchiver("test@example.com", "password", {**TEST_PROVIDER_CONFIG, "compress": True})
+        assert archiver.connect() is True
+
+        mock_enable_deflate.assert_called_once_with(client._imap)  # pylint: disable=protected-access
+
+    def test_import_leaves_imaplib_commands_alone(self):
+        """Importing the archiver should not register COMPRESS with imaplib."""
+        script = "import imaplib, src.archiver; print('COMPRESS' in imaplib.Commands)"
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+
+        assert result.stdout.strip() == "False"
+
+
 class TestMailArchiverFolders:
     """Tests for folder-related methods."""
 
@@ -116,6 +192,28 @@ class TestMailArchiverFolders:
         assert "INBOX" in folder_names
         assert "Sent" in folder_names
 
+    def test_list_folders_uses_status_counts(self, mock_imap_client):
+        """list_folders should read counts via STATUS without selecting folders."""
+        mock_imap_client.folder_status.return_value = {b"MESSAGES": 7}
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+        archiver.client = mock_imap_client
+
+        result = archiver.list_folders()
+
+        assert all(count == 7 for _name, count in result)
+        mock_imap_client.folder_status.assert_any_call("INBOX", [b"MESSAGES"])
+        mock_imap_client.select_folder.assert_not_called()
+
+    def test_list_folders_status_error(self, mock_imap_client):
+        """list_folders should show '?' when STATUS fails for a folder."""
+        mock_imap_client.folder_status.side_effect = IMAPClientError("Cannot STATUS")
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+        archiver.client = mock_imap_client
+
+        result = archiver.list_folders()
+
+        assert all(count == "?" for _name, count in result)
+
     def test_get_folder_message_count_not_connected(self):
         """get_folder_message_count should return 0 when not connected."""
         archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
@@ -136,6 +234,22 @@ class TestMailArchiverFolders:
         assert result == 42
         mock_imap_client.select_folder.assert_called_with("INBOX", readonly=True)
 
+    def test_select_folder_reuses_current_selection(self, mock_imap_client):
+        """Repeated operations on the selected folder should not SELECT it again until it changes."""
+        mock_imap_client.select_folder.return_value = {b"EXISTS": 42}
+        mock_imap_client.has_capability.return_value = False
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+        archiver.client = mock_imap_client
+
+        assert archiver.get_folder_message_count("INBOX") == 42
+        assert archiver.get_folder_message_count("INBOX") == 42
+        assert mock_imap_client.select_folder.call_count == 1
+
+        archiver.get_folder_message_count("Sent")
+        archiver._execute_deletion([1], "Sent")  # pylint: disable=protected-access
+        archiver.get_folder_message_count("Sent")
+        assert mock_imap_client.select_folder.call_count == 3
+
 
 class TestMailArchiverDownload:
     """Tests for email download functionality."""
@@ -213,13 +327,36 @@ class TestMailArchiverDownload:
         assert emails == 1
         assert attachments == 1
 
+    def test_download_folder_skips_body_parse_for_single_part(
+        self, mock_imap_client, temp_download_dir, sample_email_simple
+    ):
+        """Single-part messages should be saved without a full MIME parse."""
+        mock_imap_client.select_folder.return_value = {b"EXISTS": 1}
+        mock_imap_client.search.return_value = [1]
+        mock_imap_client.fetch.return_value = {
+            1: {
+                b"RFC822": sample_email_simple,
+                b"INTERNALDATE": datetime(2024, 1, 15, 14, 30, 0),
+            }
+        }
+
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+        archiver.client = mock_imap_client
+
+        with patch("src.archiver._MESSAGE_PARSER") as mock_parser:
+            emails, _attachments = archiver.download_folder("INBOX", temp_download_dir)
+
+        assert emails == 1
+        mock_parser.parsebytes.assert_not_called()
+
     def test_download_folder_handles_fetch_error(self, mock_imap_client, temp_download_dir, sample_email_simple):
         """download_folder should continue on individual message errors."""
         mock_imap_client.select_folder.return_value = {b"EXISTS": 2}
         mock_imap_client.search.return_value = [1, 2]
 
-        # First message fails, second succeeds
+        # Batch fetch fails, then per-message fallback: first fails, second succeeds
         mock_imap_client.fetch.side_effect = [
+            IMAPClientError("Batch fetch error"),
             IMAPClientError("Fetch error"),
             {
                 2: {
@@ -237,6 +374,45 @@ class TestMailArchiverDownload:
         # Should still process the successful message
         assert emails == 1
 
+    def test_download_folder_fetches_in_batches(self, mock_imap_client, temp_download_dir, sample_email_simple):
+        """download_folder should request several messages per FETCH command."""
+        mock_imap_client.select_folder.return_value = {b"EXISTS": 5}
+        mock_imap_client.search.return_value = [1, 2, 3, 4, 5]
+        mock_imap_client.fetch.side_effect = lambda uids, _items: {
+            uid: {
+                b"RFC822": sample_email_simple,
+                b"INTERNALDATE": datetime(2024, 1, 15, 14, 30, 0),
+            }
+            for uid in uids
+        }
+
+        config = {**TEST_PROVIDER_CONFIG, "fetch_batch_size": 2}
+        archiver = MailArchiver("test@example.com", "password", config)
+        archiver.client = mock_imap_client
+
+        emails, _attachments = archiver.download_folder("INBOX", temp_download_dir)
+
+        assert emails == 5
+        fetched_batches = [call.args[0] for call in mock_imap_client.fetch.call_args_list]
+        assert fetched_batches == [[1, 2], [3, 4], [5]]
+
+    def test_download_folder_uses_configured_persist_workers(
+        self, mock_imap_client, temp_download_dir, sample_email_simple
+    ):
+        """persist_workers from the provider config should size the writer pool."""
+        mock_imap_client.fetch.side_effect = lambda uids, _items: {
+            uid: {b"RFC822": sample_email_simple, b"INTERNALDATE": datetime(2024, 1, 15, 14, 30, uid)} for uid in uids
+        }
+
+        config = {**TEST_PROVIDER_CONFIG, "persist_workers": 1}
+        archiver = MailArchiver("test@example.com", "password", config)
+        archiver.client = mock_imap_client
+
+        emails, _attachments = archiver.download_folder("INBOX", temp_download_dir)
+
+        assert archiver.persist_workers == 1
+        assert emails == 5
+
     def test_download_folder_skips_existing_same_size(self, mock_imap_client, temp_download_dir, sample_email_simple):
         """download_folder should skip emails that exist with same size."""
         mock_imap_client.select_folder.return_value = {b"EXISTS": 1}
@@ -268,6 +444,68 @@ class TestMailArchiverDownload:
         # Email should be skipped (0 downloaded)
         assert emails == 0
 
+    def test_download_folder_skips_existing_without_body_fetch(
+        self, mock_imap_client, temp_download_dir, sample_email_simple
+    ):
+        """download_folder should not fetch bodies of messages already on disk."""
+        mock_imap_client.select_folder.return_value = {b"EXISTS": 2}
+        mock_imap_client.search.return_value = [1, 2]
+
+        internal_date = datetime(2024, 1, 15, 14, 30, 0)
+
+        def fetch(uids, items):
+            if "RFC822" in items:
+                return {uid: {b"RFC822": sample_email_simple, b"INTERNALDATE": internal_date} for uid in uids}
+            return {
+                uid: {
+                    b"INTERNALDATE": internal_date,
+                    b"RFC822.SIZE": len(sample_email_simple),
+                    b"BODY[HEADER.FIELDS (SUBJECT)]": b"Subject: Test Subject\r\n\r\n",
+                }
+                for uid in uids
+            }
+
+        mock_imap_client.fetch.side_effect = fetch
+
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+        archiver.client = mock_imap_client
+
+        # Message 1 is already downloaded, message 2 is new
+        date_str = internal_date.strftime("%Y%m%d_%H%M%S")
+        email_dir = temp_download_dir / "INBOX" / f"{date_str}_1_Test Subject"
+        email_dir.mkdir(parents=True)
+        (email_dir / "email.eml").write_bytes(sample_email_simple)
+
+        emails, _attachments = archiver.download_folder("INBOX", temp_download_dir)
+
+        assert emails == 1
+        body_fetches = [call.args[0] for call in mock_imap_client.fetch.call_args_list if "RFC822" in call.args[1]]
+        assert body_fetches == [[2]]
+
+    def test_filter_downloaded_skips_stat_for_missing_directories(self, mock_imap_client, temp_download_dir):
+        """Messages whose directory is not on disk should be queued without a stat call."""
+        internal_date = datetime(2024, 1, 15, 14, 30, 0)
+        mock_imap_client.fetch.return_value = {
+            uid: {
+                b"INTERNALDATE": internal_date,
+                b"RFC822.SIZE": 10,
+                b"BODY[HEADER.FIELDS (SUBJECT)]": b"Subject: Test Subject\r\n\r\n",
+            }
+            for uid in (1, 2)
+        }
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+        archiver.client = mock_imap_client
+        (temp_download_dir / "unrelated_dir").mkdir()
+
+        with patch("src.archiver.os.stat", wraps=os.stat) as mock_stat:
+            to_download, skipped = archiver._filter_downloaded_messages(  # pylint: disable=protected-access
+                [1, 2], temp_download_dir
+            )
+
+        assert to_download == [1, 2]
+        assert skipped == 0
+        mock_stat.assert_not_called()
+
     def test_download_folder_redownloads_different_size(self, mock_imap_client, temp_download_dir, sample_email_simple):
         """download_folder should redownload if existing file has different size."""
         mock_imap_client.select_folder.return_value = {b"EXISTS": 1}
@@ -301,6 +539,264 @@ class TestMailArchiverDownload:
         # File should have correct content now
         assert email_path.read_bytes() == sample_email_simple
 
+    def test_download_folder_headers_only(self, mock_imap_client, temp_download_dir, sample_email_with_attachment):
+        """download_folder(download_bodies=False) should fetch and save only headers."""
+        header_block = sample_email_with_attachment.split(b"\n\n", 1)[0] + b"\n\n"
+        mock_imap_client.select_folder.return_value = {b"EXISTS": 1}
+        mock_imap_client.search.return_value = [1]
+        mock_imap_client.fetch.return_value = {
+            1: {
+                b"BODY[HEADER]": header_block,
+                b"INTERNALDATE": datetime(2024, 1, 15, 14, 30, 0),
+            }
+        }
+
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+        archiver.client = mock_imap_client
+
+        emails, attachments = archiver.download_folder("INBOX", temp_download_dir, download_bodies=False)
+
+        assert emails == 1
+        assert attachments == 0
+        assert mock_imap_client.fetch.call_args.args[1] == ["BODY.PEEK[HEADER]", "INTERNALDATE"]
+        email_dirs = list((temp_download_dir / "INBOX").iterdir())
+        assert [p.name for p in email_dirs[0].iterdir()] == ["headers.eml"]
+        assert (email_dirs[0] / "headers.eml").read_bytes() == header_block
+
+
+# Provider config with CONDSTORE-based incremental downloads switched on
+SYNC_PROVIDER_CONFIG = {**TEST_PROVIDER_CONFIG, "incremental_sync": True}
+
+
+class TestMailArchiverIncrementalSync:
+    """Tests for CONDSTORE-based incremental downloads."""
+
+    @staticmethod
+    def _setup_client(client, sample_email, uidvalidity=12345, highestmodseq=100):
+        client.has_capability.return_value = True
+        client.select_folder.return_value = {b"EXISTS": 1}
+        client.folder_status.return_value = {b"UIDVALIDITY": uidvalidity, b"HIGHESTMODSEQ": highestmodseq}
+        client.search.return_value = [1]
+        client.fetch.return_value = {
+            1: {
+                b"RFC822": sample_email,
+                b"INTERNALDATE": datetime(2024, 1, 15, 14, 30, 0),
+            }
+        }
+
+    @staticmethod
+    def _write_state(folder_output, uidvalidity=12345, highestmodseq=90):
+        """Store a previous sync state next to a folder that holds one downloaded message."""
+        (folder_output / "20240101_000000_1_Earlier").mkdir(parents=True)
+        state_dir = folder_output.parent / ".imap_state"
+        state_dir.mkdir(exist_ok=True)
+        state = {"uidvalidity": uidvalidity, "highestmodseq": highestmodseq}
+        (state_dir / f"{folder_output.name}.json").write_text(json.dumps(state))
+
+    def test_first_download_stores_sync_state(self, mock_imap_client, temp_download_dir, sample_email_simple):
+        """A full download should store UIDVALIDITY and HIGHESTMODSEQ."""
+        self._setup_client(mock_imap_client, sample_email_simple)
+        archiver = MailArchiver("test@example.com", "password", SYNC_PROVIDER_CONFIG)
+        archiver.client = mock_imap_client
+
+        archiver.download_folder("INBOX", temp_download_dir)
+
+        mock_imap_client.search.assert_called_once_with(["ALL"])
+        state = json.loads((temp_download_dir / ".imap_state" / "INBOX.json").read_text())
+        assert state == {"uidvalidity": 12345, "highestmodseq": 100}
+        assert not any(path.name.startswith(".") for path in (temp_download_dir / "INBOX").iterdir())
+
+    def test_next_download_searches_changed_messages(
+        self, mock_imap_client, temp_download_dir, sample_email_simple
+    ):
+        """With a matching UIDVALIDITY only messages changed since the last run are searched."""
+        self._setup_client(mock_imap_client, sample_email_simple)
+        self._write_state(temp_download_dir / "INBOX")
+        archiver = MailArchiver("test@example.com", "password", SYNC_PROVIDER_CONFIG)
+        archiver.client = mock_imap_client
+
+        archiver.download_folder("INBOX", temp_download_dir)
+
+        mock_imap_client.search.assert_called_once_with(["MODSEQ", "91"])
+
+    def test_unchanged_folder_downloads_nothing(self, mock_imap_client, temp_download_dir, sample_email_simple):
+        """An unchanged HIGHESTMODSEQ should skip the search entirely."""
+        self._setup_client(mock_imap_client, sample_email_simple, highestmodseq=90)
+        self._write_state(temp_download_dir / "INBOX")
+        archiver = MailArchiver("test@example.com", "password", SYNC_PROVIDER_CONFIG)
+        archiver.client = mock_imap_client
+
+        emails, _attachments = archiver.download_folder("INBOX", temp_download_dir)
+
+        assert emails == 0
+        mock_imap_client.search.assert_not_called()
+        mock_imap_client.fetch.assert_not_called()
+
+    def test_uidvalidity_change_triggers_full_search(
+        self, mock_imap_client, temp_download_dir, sample_email_simple
+    ):
+        """A different UIDVALIDITY should fall back to searching all messages."""
+        self._setup_client(mock_imap_client, sample_email_simple, uidvalidity=99999)
+        self._write_state(temp_download_dir / "INBOX")
+        archiver = MailArchiver("test@example.com", "password", SYNC_PROVIDER_CONFIG)
+        archiver.client = mock_imap_client
+
+        archiver.download_folder("INBOX", temp_download_dir)
+
+        mock_imap_client.search.assert_called_once_with(["ALL"])
+
+    def test_failed_download_keeps_previous_state(self, mock_imap_client, temp_download_dir, sample_email_simple):
+        """Sync state should not advance when a message failed to download."""
+        self._setup_client(mock_imap_client, sample_email_simple)
+        mock_imap_client.fetch.return_value = {}
+        archiver = MailArchiver("test@example.com", "password", SYNC_PROVIDER_CONFIG)
+        archiver.client = mock_imap_client
+
+        archiver.download_folder("INBOX", temp_download_dir)
+
+        assert not (temp_download_dir / ".imap_state" / "INBOX.json").exists()
+
+    def test_incremental_sync_is_off_by_default(self, mock_imap_client, temp_download_dir, sample_email_simple):
+        """Without incremental_sync every run searches all messages and stores no state."""
+        self._setup_client(mock_imap_client, sample_email_simple)
+        self._write_state(temp_download_dir / "INBOX")
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+        archiver.client = mock_imap_client
+
+        archiver.download_folder("INBOX", temp_download_dir)
+
+        mock_imap_client.search.assert_called_once_with(["ALL"])
+        mock_imap_client.folder_status.assert_not_called()
+
+    def test_emptied_local_folder_triggers_full_search(
+        self, mock_imap_client, temp_download_dir, sample_email_simple
+    ):
+        """A folder emptied since the last run (e.g. by --delete-local) should be downloaded again."""
+        self._setup_client(mock_imap_client, sample_email_simple, highestmodseq=90)
+        self._write_state(temp_download_dir / "INBOX")
+        (temp_download_dir / "INBOX" / "20240101_000000_1_Earlier").rmdir()
+        archiver = MailArchiver("test@example.com", "password", SYNC_PROVIDER_CONFIG)
+        archiver.client = mock_imap_client
+
+        emails, _attachments = archiver.download_folder("INBOX", temp_download_dir)
+
+        assert emails == 1
+        mock_imap_client.search.assert_called_once_with(["ALL"])
+
+
+class TestMailArchiverArchiveFormat:
+    """Tests for the archive_format option."""
+
+    def test_unknown_archive_format_falls_back_to_dir(self):
+        """MailArchiver should use the directory layout for unknown formats."""
+        config = {**TEST_PROVIDER_CONFIG, "archive_format": "rar"}
+        archiver = MailArchiver("test@example.com", "password", config)
+
+        assert archiver.archive_format == "dir"
+
+    def test_download_folder_writes_tar_archive(
+        self, mock_imap_client, temp_download_dir, sample_email_simple, sample_email_with_attachment
+    ):
+        """download_folder should stream messages into one tar archive per run."""
+        mock_imap_client.select_folder.return_value = {b"EXISTS": 2}
+        mock_imap_client.search.return_value = [1, 2]
+        mock_imap_client.fetch.return_value = {
+            1: {b"RFC822": sample_email_simple, b"INTERNALDATE": datetime(2024, 1, 15, 14, 30, 0)},
+            2: {b"RFC822": sample_email_with_attachment, b"INTERNALDATE": datetime(2024, 1, 15, 15, 0, 0)},
+        }
+
+        config = {**TEST_PROVIDER_CONFIG, "archive_format": "tar.gz"}
+        archiver = MailArchiver("test@example.com", "password", config)
+        archiver.client = mock_imap_client
+
+        emails, attachments = archiver.download_folder("INBOX", temp_download_dir)
+
+        assert emails == 2
+        assert attachments == 0
+        [archive_path] = (temp_download_dir / "INBOX").glob("*.tar.gz")
+        index_path = archive_path.with_name(f"{archive_path.name}.index.json")
+        assert json.loads(index_path.read_text()) == {
+            "20240115_143000_1_Test Subject/email.eml": len(sample_email_simple),
+            "20240115_150000_2_Email with Attachment/email.eml": len(sample_email_with_attachment),
+        }
+        with tarfile.open(archive_path) as tar:
+            assert tar.getnames() == [
+                "20240115_143000_1_Test Subject/email.eml",
+                "20240115_150000_2_Email with Attachment/email.eml",
+            ]
+            assert tar.extractfile(tar.getmembers()[0]).read() == sample_email_simple
+
+    @staticmethod
+    def _fetch_with_metadata(raw_email, internal_date):
+        """Build a fetch side effect answering metadata, header and body requests."""
+
+        def fetch(uids, items):
+            if "RFC822.SIZE" in items:
+                return {
+                    uid: {
+                        b"INTERNALDATE": internal_date,
+                        b"RFC822.SIZE": len(raw_email),
+                        b"BODY[HEADER.FIELDS (SUBJECT)]": b"Subject: Test Subject\r\n\r\n",
+                    }
+                    for uid in uids
+                }
+            key = b"RFC822" if "RFC822" in items else b"BODY[HEADER]"
+            return {uid: {key: raw_email, b"INTERNALDATE": internal_date} for uid in uids}
+
+        return fetch
+
+    @pytest.mark.parametrize(
+        ("archived_member", "download_bodies"),
+        [("email.eml", True), ("headers.eml", False), ("email.eml", False)],
+    )
+    def test_download_folder_skips_messages_in_archive_index(
+        self, mock_imap_client, temp_download_dir, sample_email_simple, archived_member, download_bodies
+    ):
+        """A tar run should only fetch messages missing from the indexes of earlier archives."""
+        mock_imap_client.select_folder.return_value = {b"EXISTS": 2}
+        mock_imap_client.search.return_value = [1, 2]
+        mock_imap_client.fetch.side_effect = self._fetch_with_metadata(
+            sample_email_simple, datetime(2024, 1, 15, 14, 30, 0)
+        )
+        folder_output = temp_download_dir / "INBOX"
+        folder_output.mkdir()
+        index = {f"20240115_143000_1_Test Subject/{archived_member}": len(sample_email_simple)}
+        (folder_output / "archive_20240101_000000.tar.gz.index.json").write_text(json.dumps(index))
+
+        config = {**TEST_PROVIDER_CONFIG, "archive_format": "tar.gz"}
+        archiver = MailArchiver("test@example.com", "password", config)
+        archiver.client = mock_imap_client
+
+        emails, _attachments = archiver.download_folder("INBOX", temp_download_dir, download_bodies=download_bodies)
+
+        assert emails == 1
+        message_fetches = [call.args[0] for call in mock_imap_client.fetch.call_args_list if "RFC822.SIZE" not in call.args[1]]
+        assert message_fetches == [[2]]
+
+    def test_download_folder_ignores_archive_without_index(
+        self, mock_imap_client, temp_download_dir, sample_email_simple
+    ):
+        """An archive left without an index by an interrupted run should not count as archived."""
+        mock_imap_client.select_folder.return_value = {b"EXISTS": 1}
+        mock_imap_client.search.return_value = [1]
+        mock_imap_client.fetch.side_effect = self._fetch_with_metadata(
+            sample_email_simple, datetime(2024, 1, 15, 14, 30, 0)
+        )
+        folder_output = temp_download_dir / "INBOX"
+        folder_output.mkdir()
+        with tarfile.open(folder_output / "archive_20240101_000000.tar.gz", "w:gz") as tar:
+            member = tarfile.TarInfo("20240115_143000_1_Test Subject/email.eml")
+            member.size = len(sample_email_simple)
+            tar.addfile(member, io.BytesIO(sample_email_simple))
+
+        config = {**TEST_PROVIDER_CONFIG, "archive_format": "tar.gz"}
+        archiver = MailArchiver("test@example.com", "password", config)
+        archiver.client = mock_imap_client
+
+        emails, _attachments = archiver.download_folder("INBOX", temp_download_dir)
+
+        assert emails == 1
+
 
 class TestMailArchiverTestConnection:
     """Tests for test_connection method."""
@@ -378,6 +874,71 @@ class TestMailArchiverDelete:
         mock_imap_client.delete_messages.assert_not_called()
         mock_imap_client.expunge.assert_not_called()
 
+    def test_execute_deletion_in_chunks(self, mock_imap_client):
+        """Deletion should store flags in chunks and expunge once without UIDPLUS."""
+        mock_imap_client.has_capability.return_value = False
+        messages = list(range(1, 2501))
+
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+        archiver.client = mock_imap_client
+
+        result = archiver._execute_deletion(messages, "INBOX")  # pylint: disable=protected-access
+
+        assert result == 2500
+        chunks = [call.args[0] for call in mock_imap_client.delete_messages.call_args_list]
+        assert chunks == ["1:1000", "1001:2000", "2001:2500"]
+        mock_imap_client.expunge.assert_called_once_with()
+        mock_imap_client.uid_expunge.assert_not_called()
+
+    def test_execute_deletion_uses_uid_expunge(self, mock_imap_client):
+        """Deletion should expunge each chunk by UID when UIDPLUS is available."""
+        mock_imap_client.has_capability.return_value = True
+        messages = list(range(1, 1501))
+
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+        archiver.client = mock_imap_client
+
+        archiver._execute_deletion(messages, "INBOX")  # pylint: disable=protected-access
+
+        assert mock_imap_client.uid_expunge.call_count == 2
+        mock_imap_client.has_capability.assert_called_with("UIDPLUS")
+        mock_imap_client.expunge.assert_not_called()
+
+    def test_execute_deletion_halves_batch_on_line_too_long(self, mock_imap_client):
+        """A batch rejected as too long should be retried in halves until the server accepts it."""
+        mock_imap_client.has_capability.return_value = True
+
+        def delete_messages(uid_set, silent):  # pylint: disable=unused-argument
+            if uid_set.count(",") > 1:
+                raise IMAPClientError("Command line too long")
+
+        mock_imap_client.delete_messages.side_effect = delete_messages
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+        archiver.client = mock_imap_client
+
+        result = archiver._execute_deletion([1, 3, 5, 7, 9, 11], "INBOX")  # pylint: disable=protected-access
+
+        assert result == 6
+        expunged = [call.args[0] for call in mock_imap_client.uid_expunge.call_args_list]
+        assert expunged == ["1", "3,5", "7", "9,11"]
+
+    def test_execute_deletion_reraises_other_errors(self, mock_imap_client):
+        """Errors other than an overlong command line should not be retried."""
+        mock_imap_client.has_capability.return_value = False
+        mock_imap_client.delete_messages.side_effect = IMAPClientError("Mailbox is read-only")
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+        archiver.client = mock_imap_client
+
+        with pytest.raises(IMAPClientError):
+            archiver._execute_deletion([1, 3, 5], "INBOX")  # pylint: disable=protected-access
+
+        mock_imap_client.delete_messages.assert_called_once()
+
+    def test_compact_uid_set(self):
+        """UIDs should be collapsed into sorted ranges, keeping isolated UIDs as they are."""
+        assert _compact_uid_set([7, 1, 2, 3, 5, 9, 8]) == "1:3,5,7:9"
+        assert _compact_uid_set([42]) == "42"
+
 
 class TestMailArchiverAttachmentFilenames:
     """Tests for attachment filename sanitization with edge cases."""
@@ -530,3 +1091,131 @@ class TestMailArchiverAttachmentFilenames:
         assert filename.endswith(".pdf")
         # Content should be saved correctly
         assert saved_files[0].read_bytes() == b"Employment contract content"
+
+    def test_save_attachments_from_nested_parts(self, tmp_path):
+        """Attachments inside nested multiparts should be found; containers ignored."""
+        inner = MIMEMultipart("mixed")
+        attachment = MIMEBase("application", "pdf")
+        attachment.set_payload(b"nested content")
+        attachment.add_header("Content-Disposition", "ATTACHMENT", filename="nested.pdf")
+        inner.attach(attachment)
+        inner.add_header("Content-Disposition", "attachment", filename="container.bin")
+
+        msg = MIMEMultipart()
+        msg["Subject"] = "Test"
+        msg.attach(inner)
+
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+
+        count = archiver._save_attachments(msg, tmp_path)  # pylint: disable=protected-access
+
+        assert count == 1
+        assert [f.name for f in tmp_path.iterdir()] == ["nested.pdf"]
+
+    def test_save_attachments_with_duplicate_names(self, tmp_path):
+        """Attachments sharing a filename should get numbered suffixes."""
+        msg = MIMEMultipart()
+        msg["Subject"] = "Test"
+        for content in (b"first", b"second", b"third"):
+            attachment = MIMEBase("application", "octet-stream")
+            attachment.set_payload(content)
+            attachment.add_header("Content-Disposition", "attachment", filename="image001.png")
+            msg.attach(attachment)
+
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+
+        count = archiver._save_attachments(msg, tmp_path)  # pylint: disable=protected-access
+
+        assert count == 3
+        assert (tmp_path / "image001.png").read_bytes() == b"first"
+        assert (tmp_path / "image001_1.png").read_bytes() == b"second"
+        assert (tmp_path / "image001_2.png").read_bytes() == b"third"
+
+
+class TestMailArchiverAttachmentPayloads:
+    """Tests for decoding attachment payloads to disk."""
+
+    @staticmethod
+    def _build_message(payload: str, encoding: str) -> MIMEMultipart:
+        msg = MIMEMultipart()
+        msg["Subject"] = "Test"
+        attachment = MIMEBase("application", "octet-stream")
+        attachment.set_payload(payload)
+        attachment["Content-Transfer-Encoding"] = encoding
+        attachment.add_header("Content-Disposition", "attachment", filename="data.bin")
+        msg.attach(attachment)
+        return msg
+
+    def test_save_base64_attachment(self, tmp_path):
+        """Base64 attachments should be decoded into the file."""
+        msg = self._build_message("UERGIGNvbnRlbnQgaGVyZQ==\n", "base64")
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+
+        count = archiver._save_attachments(msg, tmp_path)  # pylint: disable=protected-access
+
+        assert count == 1
+        assert (tmp_path / "data.bin").read_bytes() == b"PDF content here"
+
+    def test_save_quoted_printable_attachment(self, tmp_path):
+        """Quoted-printable attachments should be decoded into the file."""
+        msg = self._build_message("Caf=C3=A9 =\nau lait", "quoted-printable")
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+
+        count = archiver._save_attachments(msg, tmp_path)  # pylint: disable=protected-access
+
+        assert count == 1
+        assert (tmp_path / "data.bin").read_bytes() == "Café au lait".encode()
+
+    def test_save_base64_attachment_with_bad_padding(self, tmp_path):
+        """Malformed base64 should fall back to lenient decoding."""
+        msg = self._build_message("VGVzdA\n", "base64")
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+
+        count = archiver._save_attachments(msg, tmp_path)  # pylint: disable=protected-access
+
+        assert count == 1
+        assert (tmp_path / "data.bin").read_bytes() == b"Test"
+
+    def test_empty_attachment_is_not_saved(self, tmp_path):
+        """Attachments without payload should not create files."""
+        msg = self._build_message("\n", "base64")
+        archiver = MailArchiver("test@example.com", "password", TEST_PROVIDER_CONFIG)
+
+        count = archiver._save_attachments(msg, tmp_path)  # pylint: disable=protected-access
+
+        assert count == 0
+        assert not any(tmp_path.iterdir())
+
+    def test_dedupe_attachments_hardlinks_repeated_payloads(self, tmp_path):
+        """Identical attachments across emails should share one stored blob."""
+        config = {**TEST_PROVIDER_CONFIG, "dedupe_attachments": True}
+        archiver = MailArchiver("test@example.com", "password", config)
+        first_dir = tmp_path / "INBOX" / "first"
+        second_dir = tmp_path / "INBOX" / "second"
+        first_dir.mkdir(parents=True)
+        second_dir.mkdir(parents=True)
+
+        for email_dir in (first_dir, second_dir):
+            msg = self._build_message("UERGIGNvbnRlbnQgaGVyZQ==\n", "base64")
+            assert archiver._save_attachments(msg, email_dir) == 1  # pylint: disable=protected-access
+
+        first, second = first_dir / "data.bin", second_dir / "data.bin"
+        assert first.read_bytes() == second.read_bytes() == b"PDF content here"
+        assert first.stat().st_ino == second.stat().st_ino
+        assert len(list((tmp_path / "_attachments").rglob("*"))) == 2  # one shard directory, one blob
+
+    def test_dedupe_attachments_interrupted_write_leaves_no_blob(self, tmp_path):
+        """A blob write that fails midway should not leave a partial blob to link."""
+        config = {**TEST_PROVIDER_CONFIG, "dedupe_attachments": True}
+        archiver = MailArchiver("test@example.com", "password", config)
+        email_dir = tmp_path / "INBOX" / "first"
+        email_dir.mkdir(parents=True)
+        msg = self._build_message("UERGIGNvbnRlbnQgaGVyZQ==\n", "base64")
+
+        with patch("src.archiver.os.replace", side_effect=OSError("disk full")), pytest.raises(OSError):
+            archiver._save_attachments(msg, email_dir)  # pylint: disable=protected-access
+
+        assert not [path for path in (tmp_path / "_attachments").rglob("*") if path.is_file()]
+
+        assert archiver._save_attachments(msg, email_dir) == 1  # pylint: disable=protected-access
+        assert (email_dir / "data.bin").read_bytes() == b"PDF content here"
@@ -7,12 +7,25 @@ import sys
 from unittest.mock import MagicMock, patch
 
 import pytest
-from src.cli import main
+from src.cli import main, parse_args, select_folder_interactive
 
 
 class TestCLIArguments:
     """Tests for command line argument parsing."""
 
+    def test_parse_args_reuses_parser_between_calls(self):
+        """parse_args should give independent results when its parser is reused."""
+        with patch.object(sys, "argv", ["mail_archive.py", "--folder", "INBOX", "--nas"]):
+            first = parse_args()
+        with patch.object(sys, "argv", ["mail_archive.py", "--list"]):
+            second = parse_args()
+
+        assert first.download.folder == "INBOX"
+        assert first.nas is True
+        assert second.download.folder is None
+        assert second.nas is False
+        assert second.list_folders is True
+
     def test_list_argument(self):
         """--list argument should be recognized."""
         with patch.object(sys, "argv", ["mail_archive.py", "--list"]):
@@ -186,3 +199,19 @@ class TestMainFunction:
                 main()
 
             assert exc_info.value.code == 1
+
+
+class TestSelectFolderInteractive:
+    """Tests for interactive folder selection."""
+
+    FOLDERS = (("INBOX", 5), ("Sent", 3))
+
+    def test_reads_plain_input_when_not_a_tty(self):
+        """Piped stdin should be read with input() instead of rich's prompt."""
+        with patch.object(sys.stdin, "isatty", return_value=False), patch("builtins.input", return_value="2"):
+            assert select_folder_interactive(self.FOLDERS) == "Sent"
+
+    def test_stops_at_end_of_piped_input(self):
+        """Running out of piped input should end the selection."""
+        with patch.object(sys.stdin, "isatty", return_value=False), patch("builtins.input", side_effect=EOFError):
+            assert select_folder_interactive(self.FOLDERS) is None
@@ -3,7 +3,6 @@ Tests for provider configuration and loading functionality.
 """
 
 import os
-from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -14,26 +13,15 @@ from src.config import (
     get_default_provider,
     load_provider_config,
 )
+from tests.conftest import CONFIG_YAML_PATH
 
 
 class TestLoadProviderConfig:
     """Tests for load_provider_config function."""
 
-    def test_load_gmx_from_config_file(self, tmp_path):
+    def test_load_gmx_from_config_file(self, gmx_config_file):
         """Should load GMX config from YAML file."""
-        config_content = """
-providers:
-  gmx:
-    name: GMX Mail
-    imap_host: imap.gmx.net
-    imap_port: 993
-    ssl: true
-default: gmx
-"""
-        config_file = tmp_path / "providers.yaml"
-        config_file.write_text(config_content)
-
-        result = load_provider_config("gmx", config_file)
+        result = load_provider_config("gmx", gmx_config_file)
 
         assert result["name"] == "GMX Mail"
         assert result["imap_host"] == "imap.gmx.net"
@@ -58,21 +46,10 @@ providers:
         assert result["name"] == "Google Gmail"
         assert result["imap_host"] == "imap.gmail.com"
 
-    def test_load_unknown_provider_raises_error(self, tmp_path):
+    def test_load_unknown_provider_raises_error(self, gmx_config_file):
         """Should raise ValueError for unknown provider."""
-        config_content = """
-providers:
-  gmx:
-    name: GMX Mail
-    imap_host: imap.gmx.net
-    imap_port: 993
-    ssl: true
-"""
-        config_file = tmp_path / "providers.yaml"
-        config_file.write_text(config_content)
-
         with pytest.raises(ValueError) as exc_info:
-            load_provider_config("unknown_provider", config_file)
+            load_provider_config("unknown_provider", gmx_config_file)
 
         assert "Unknown provider 'unknown_provider'" in str(exc_info.value)
         assert "Available: gmx" in str(exc_info.value)
@@ -107,6 +84,14 @@ providers:
         assert result["name"] == "Outlook"
         assert result["imap_host"] == "outlook.office365.com"
 
+    def test_builtin_defaults_are_not_shared(self, tmp_path):
+        """Changing a returned built-in config should not affect later loads."""
+        nonexistent_path = tmp_path / "nonexistent" / "providers.yaml"
+
+        load_provider_config("gmx", nonexistent_path)["imap_port"] = 143
+
+        assert load_provider_config("gmx", nonexistent_path)["imap_port"] == 993
+
     def test_unknown_provider_without_config_raises_error(self, tmp_path):
         """Should raise error for unknown provider when no config file."""
         nonexistent_path = tmp_path / "nonexistent" / "providers.yaml"
@@ -140,33 +125,127 @@ providers:
         assert result["imap_port"] == 587
         assert result["ssl"] is False
 
-    def test_custom_provider_ssl_variations(self, tmp_path):
+    def test_custom_provider_placeholder_defaults(self, tmp_path):
+        """Placeholders should fall back to their inline defaults when variables are unset."""
+        config_file = tmp_path / "providers.yaml"
+        config_file.write_text(
+            "providers:\n"
+            "  custom:\n"
+            '    imap_host: "${IMAP_HOST:-mail.example.com}"\n'
+            '    imap_port: "${IMAP_PORT:-993}"\n'
+            '    ssl: "${IMAP_SSL:-true}"\n'
+        )
+
+        with patch.dict(os.environ, {}, clear=True):
+            result = load_provider_config("custom", config_file)
+
+        assert result["imap_host"] == "mail.example.com"
+        assert result["imap_port"] == 993
+        assert result["ssl"] is True
+
+    @pytest.mark.parametrize(
+        "raw,expected",
+        [("yes", True), ("1", True), ("true", True), ("no", False), ("false", False)],
+    )
+    def test_custom_provider_ssl_variations(self, custom_config_file, monkeypatch, raw, expected):
         """Custom provider should handle various SSL env values."""
-        config_content = """
-providers:
-  custom:
-    name: Custom
-    imap_host: mail.test.com
-    imap_port: 993
-    ssl: true
-"""
+        monkeypatch.setenv("IMAP_SSL", raw)
+
+        result = load_provider_config("custom", custom_config_file)
+
+        assert result["ssl"] is expected
+
+    def test_custom_provider_does_not_modify_cached_config(self, tmp_path):
+        """Environment substitution should not leak into later loads of the same file."""
         config_file = tmp_path / "providers.yaml"
-        config_file.write_text(config_content)
+        config_file.write_text("providers:\n  custom:\n    imap_host: mail.test.com\n")
 
-        # Test "yes" as true
-        with patch.dict(os.environ, {"IMAP_SSL": "yes"}, clear=False):
-            result = load_provider_config("custom", config_file)
-            assert result["ssl"] is True
+        with patch.dict(os.environ, {"IMAP_HOST": "override.example.com"}):
+            assert load_provider_config("custom", config_file)["imap_host"] == "override.example.com"
 
-        # Test "1" as true
-        with patch.dict(os.environ, {"IMAP_SSL": "1"}, clear=False):
-            result = load_provider_config("custom", config_file)
-            assert result["ssl"] is True
+        with patch.dict(os.environ, {}, clear=True):
+            assert load_provider_config("custom", config_file)["imap_host"] == "mail.test.com"
 
-        # Test "no" as false
-        with patch.dict(os.environ, {"IMAP_SSL": "no"}, clear=False):
-            result = load_provider_config("custom", config_file)
-            assert result["ssl"] is False
+    def test_config_file_parsed_once(self, tmp_path):
+        """load_provider_config and get_default_provider should share one YAML parse."""
+        config_file = tmp_path / "providers.yaml"
+        config_file.write_text("providers:\n  gmx:\n    imap_host: imap.gmx.net\ndefault: gmx\n")
+
+        with patch("yaml.compose", wraps=yaml.compose) as mock_load:
+            provider = get_default_provider(config_file)
+            load_provider_config(provider, config_file)
+
+        assert mock_load.call_count == 1
+
+    def test_config_file_reparsed_after_change(self, tmp_path):
+        """An edited config file should be parsed again instead of served from the cache."""
+        config_file = tmp_path / "providers.yaml"
+        config_file.write_text("providers:\n  gmx:\n    imap_host: imap.gmx.net\ndefault: gmx\n")
+        assert get_default_provider(config_file) == "gmx"
+
+        config_file.write_text("providers:\n  gmail:\n    imap_host: imap.gmail.com\ndefault: gmail\n")
+
+        assert get_default_provider(config_file) == "gmail"
+
+    def test_only_requested_provider_is_constructed(self, tmp_path):
+        """Other providers in the file should not be constructed."""
+        config_file = tmp_path / "providers.yaml"
+        config_file.write_text(
+            "providers:\n"
+            "  gmx:\n"
+            "    imap_host: imap.gmx.net\n"
+            "  broken: !!python/name:os.system\n"
+        )
+
+        result = load_provider_config("gmx", config_file)
+
+        assert result["imap_host"] == "imap.gmx.net"
+
+    def test_deleted_config_file_falls_back_to_builtin(self, tmp_path):
+        """Removing the config file between loads should fall back to the built-in defaults."""
+        config_file = tmp_path / "providers.yaml"
+        config_file.write_text("providers:\n  gmx:\n    name: From File\n    imap_host: imap.gmx.net\n")
+        assert load_provider_config("gmx", config_file)["name"] == "From File"
+
+        config_file.unlink()
+
+        assert load_provider_config("gmx", config_file)["name"] == "GMX Mail"
+
+    def test_config_file_created_later_is_used(self, tmp_path):
+        """A config file that appears after the first lookup should be picked up."""
+        config_file = tmp_path / "providers.yaml"
+        assert get_default_provider(config_file) == "gmx"
+
+        config_file.write_text("providers:\n  gmail:\n    imap_host: imap.gmail.com\ndefault: gmail\n")
+
+        assert get_default_provider(config_file) == "gmail"
+
+    def test_config_file_removed_before_read_uses_next_candidate(self, tmp_path):
+        """A candidate that disappears between the stat and the read should be skipped."""
+        vanished = tmp_path / "first" / "providers.yaml"
+        fallback = tmp_path / "second" / "providers.yaml"
+        for path, default in ((vanished, "gmail"), (fallback, "outlook")):
+            path.parent.mkdir()
+            path.write_text(f"providers:\n  {default}:\n    imap_host: imap.example.com\ndefault: {default}\n")
+        real_open = open
+
+        def open_after_unlink(file, *args, **kwargs):
+            if file == str(vanished.resolve()):
+                vanished.unlink()
+            return real_open(file, *args, **kwargs)
+
+        with (
+            patch("src.config.CONFIG_PATHS", [vanished, fallback]),
+            patch("builtins.open", side_effect=open_after_unlink),
+        ):
+            assert get_default_provider() == "outlook"
+
+    def test_directory_is_not_used_as_config_file(self, tmp_path):
+        """A directory at the config path should be skipped like a missing file."""
+        config_dir = tmp_path / "providers.yaml"
+        config_dir.mkdir()
+
+        assert get_default_provider(config_dir) == "gmx"
 
     def test_searches_default_config_paths(self):
         """Should search through default CONFIG_PATHS."""
@@ -296,53 +375,32 @@ class TestProviderConfigFile:
 
     def test_config_file_exists(self):
         """The providers.yaml config file should exist."""
-        config_path = Path(__file__).parent.parent / "config" / "providers.yaml"
-        assert config_path.exists(), f"Config file not found at {config_path}"
+        assert CONFIG_YAML_PATH.exists(), f"Config file not found at {CONFIG_YAML_PATH}"
 
-    def test_config_file_valid_yaml(self):
+    def test_config_file_valid_yaml(self, providers_config):
         """The providers.yaml should be valid YAML."""
-        config_path = Path(__file__).parent.parent / "config" / "providers.yaml"
-
-        with open(config_path, encoding="utf-8") as f:
-            config = yaml.safe_load(f)
+        assert "providers" in providers_config
+        assert "default" in providers_config
 
-        assert "providers" in config
-        assert "default" in config
-
-    def test_config_has_required_providers(self):
+    def test_config_has_required_providers(self, providers_config):
         """Config should have all expected providers."""
-        config_path = Path(__file__).parent.parent / "config" / "providers.yaml"
-
-        with open(config_path, encoding="utf-8") as f:
-            config = yaml.safe_load(f)
-
-        providers = config["providers"]
+        providers = providers_config["providers"]
         expected_providers = ["gmx", "gmail", "outlook", "yahoo", "icloud", "custom"]
 
         for provider in expected_providers:
             assert provider in providers, f"Missing provider: {provider}"
 
-    def test_config_providers_have_required_fields(self):
+    def test_config_providers_have_required_fields(self, providers_config):
         """Each provider should have required fields."""
-        config_path = Path(__file__).parent.parent / "config" / "providers.yaml"
-
-        with open(config_path, encoding="utf-8") as f:
-            config = yaml.safe_load(f)
-
         required_fields = ["name", "imap_host", "imap_port", "ssl"]
 
-        for provider_name, provider_config in config["providers"].items():
+        for provider_name, provider_config in providers_config["providers"].items():
             for field in required_fields:
                 assert field in provider_config, f"Provider '{provider_name}' missing field: {field}"
 
-    def test_config_default_is_valid_provider(self):
+    def test_config_default_is_valid_provider(self, providers_config):
         """Default provider should be a valid provider in the config."""
-        config_path = Path(__file__).parent.parent / "config" / "providers.yaml"
-
-        with open(config_path, encoding="utf-8") as f:
-            config = yaml.safe_load(f)
-
-        default = config["default"]
-        providers = config["providers"]
+        default = providers_config["default"]
+        providers = providers_config["providers"]
 
         assert default in providers, f"Default provider '{default}' not in providers list"
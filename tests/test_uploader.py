@@ -2,10 +2,14 @@
 Tests for NASUploader class.
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, mock_open, patch
 
+from smbprotocol.exceptions import SMBOSError
+from smbprotocol.header import NtStatus
+
 from src.config import NASConfig
-from src.uploader import NASUploader
+from src.uploader import UPLOAD_CHUNK_SIZE, NASUploader, _get_smbclient, _get_upload_buffer
 
 
 def create_uploader(
@@ -51,6 +55,14 @@ class TestNASUploaderInit:
 
         assert uploader.base_path == ""
 
+    def test_init_bounds_worker_count(self):
+        """The upload pool size should come from the config and never drop below one."""
+        config = NASConfig(host="nas.local", share="backup", username="admin", password="secret", max_workers=3)
+        assert NASUploader(config).max_workers == 3
+
+        config.max_workers = 0
+        assert NASUploader(config).max_workers == 1
+
 
 class TestNASUploaderUpload:
     """Tests for upload_directory method."""
@@ -64,6 +76,17 @@ class TestNASUploaderUpload:
         assert files_count == 3  # email.eml, attachment.pdf, nested_file.txt
         assert total_size > 0
 
+    def test_collect_files_returns_sizes(self, temp_upload_dir):
+        """_collect_files should return every nested file with its size in one pass."""
+        uploader = create_uploader()
+
+        files, total_size = uploader._collect_files(temp_upload_dir)  # pylint: disable=protected-access
+
+        sizes = {path.relative_to(temp_upload_dir).as_posix(): size for path, size in files}
+        assert sizes == {"email.eml": 13, "attachment.pdf": 11, "subfolder/nested_file.txt": 14}
+        assert total_size == 38
+        assert [path.parent for path, _ in files] == sorted(path.parent for path, _ in files)
+
     @patch("src.uploader.NASUploader.upload_directory")
     def test_upload_missing_smbprotocol(self, mock_upload, temp_upload_dir):
         """upload_directory should handle missing smbprotocol."""
@@ -77,18 +100,29 @@ class TestNASUploaderUpload:
 
         assert result == (0, 0)
 
-    def test_upload_success(self, temp_upload_dir):
+    def test_upload_without_smbprotocol_returns_nothing(self, temp_upload_dir):
+        """upload_directory should return (0, 0) when smbclient cannot be imported."""
+        uploader = create_uploader()
+        _get_smbclient.cache_clear()
+
+        try:
+            with patch.dict("sys.modules", {"smbclient": None}):
+                result = uploader.upload_directory(temp_upload_dir)
+        finally:
+            _get_smbclient.cache_clear()
+
+        assert result == (0, 0)
+
+    def test_upload_success(self, temp_upload_dir, fake_smb_open):
         """upload_directory should upload all files."""
         uploader = create_uploader(base_path="/archive")
 
         with (
             patch("smbclient.register_session") as mock_register,
             patch("smbclient.makedirs"),
-            patch("smbclient.open_file", mock_open()),
-            patch("smbclient.stat") as mock_stat,
+            patch("smbclient.open_file", side_effect=fake_smb_open),
+            patch("smbclient.listdir", return_value=[]),
         ):
-            # Simulate files don't exist on NAS
-            mock_stat.side_effect = OSError("File not found")
 
             files_count, total_size = uploader.upload_directory(temp_upload_dir)
 
@@ -96,6 +130,25 @@ class TestNASUploaderUpload:
             assert files_count == 3
             assert total_size > 0
 
+    def test_upload_reuses_registered_session(self, temp_upload_dir, fake_smb_open):
+        """Connection test and uploads to the same NAS should register the SMB session only once."""
+        uploader = create_uploader(base_path="/archive")
+
+        with (
+            patch("smbclient.register_session") as mock_register,
+            patch("smbclient.makedirs"),
+            patch("smbclient.open_file", side_effect=fake_smb_open),
+            patch("smbclient.listdir", return_value=[]),
+            patch("smbclient.stat"),
+        ):
+            assert uploader.test_connection() is True
+            uploader.upload_directory(temp_upload_dir)
+            uploader.upload_directory(temp_upload_dir, overwrite=True)
+            # The CLI builds a separate uploader per target folder
+            create_uploader(base_path="/archive/INBOX").upload_directory(temp_upload_dir)
+
+        mock_register.assert_called_once_with("nas.local", username="admin", password="secret")
+
     def test_upload_connection_failure(self, temp_upload_dir):
         """upload_directory should handle connection failures."""
         uploader = create_uploader(password="wrong")
@@ -108,7 +161,7 @@ class TestNASUploaderUpload:
             assert files_count == 0
             assert total_size == 0
 
-    def test_upload_empty_directory(self, tmp_path):
+    def test_upload_empty_directory(self, tmp_path, fake_smb_open):
         """upload_directory should handle empty directories."""
         empty_dir = tmp_path / "empty"
         empty_dir.mkdir()
@@ -118,10 +171,9 @@ class TestNASUploaderUpload:
         with (
             patch("smbclient.register_session"),
             patch("smbclient.makedirs"),
-            patch("smbclient.open_file", mock_open()),
-            patch("smbclient.stat") as mock_stat,
+            patch("smbclient.open_file", side_effect=fake_smb_open),
+            patch("smbclient.listdir", return_value=[]),
         ):
-            mock_stat.side_effect = OSError("File not found")
 
             files_count, total_size = uploader.upload_directory(empty_dir)
 
@@ -136,10 +188,10 @@ class TestNASUploaderUpload:
             patch("smbclient.register_session"),
             patch("smbclient.makedirs"),
             patch("smbclient.open_file", mock_open()) as mock_smb_open,
-            patch("smbclient.stat") as mock_stat,
+            patch("smbclient.listdir") as mock_listdir,
         ):
             # Simulate all files already exist on NAS
-            mock_stat.return_value = True  # File exists
+            mock_listdir.return_value = ["email.eml", "attachment.pdf", "nested_file.txt"]
 
             files_count, _ = uploader.upload_directory(temp_upload_dir, overwrite=False)
 
@@ -148,18 +200,36 @@ class TestNASUploaderUpload:
             # open_file should not be called for writing
             mock_smb_open.assert_not_called()
 
-    def test_upload_overwrites_existing_files(self, temp_upload_dir):
-        """upload_directory should overwrite existing files when overwrite=True."""
+    def test_upload_lists_each_remote_directory_once(self, temp_upload_dir, fake_smb_open):
+        """upload_directory should check existence with one listdir per directory instead of per-file stat."""
         uploader = create_uploader(base_path="/archive")
 
         with (
             patch("smbclient.register_session"),
             patch("smbclient.makedirs"),
-            patch("smbclient.open_file", mock_open()),
+            patch("smbclient.open_file", side_effect=fake_smb_open),
+            patch("smbclient.listdir", return_value=["email.eml", "ATTACHMENT.pdf"]) as mock_listdir,
             patch("smbclient.stat") as mock_stat,
+        ):
+            files_count, _ = uploader.upload_directory(temp_upload_dir)
+
+        # email.eml already exists; ATTACHMENT.pdf is another file on a case-sensitive share
+        assert files_count == 2
+        assert mock_listdir.call_count == 2  # root and subfolder
+        mock_stat.assert_not_called()
+
+    def test_upload_overwrites_existing_files(self, temp_upload_dir, fake_smb_open):
+        """upload_directory should overwrite existing files when overwrite=True."""
+        uploader = create_uploader(base_path="/archive")
+
+        with (
+            patch("smbclient.register_session"),
+            patch("smbclient.makedirs"),
+            patch("smbclient.open_file", side_effect=fake_smb_open),
+            patch("smbclient.listdir") as mock_listdir,
         ):
             # Simulate all files already exist on NAS
-            mock_stat.return_value = True  # File exists
+            mock_listdir.return_value = ["email.eml", "attachment.pdf", "nested_file.txt"]
 
             files_count, total_size = uploader.upload_directory(temp_upload_dir, overwrite=True)
 
@@ -167,7 +237,7 @@ class TestNASUploaderUpload:
             assert files_count == 3
             assert total_size > 0
 
-    def test_upload_creates_nested_directories(self, temp_upload_dir):
+    def test_upload_creates_nested_directories(self, temp_upload_dir, fake_smb_open):
         """upload_directory should create nested directories on first makedirs failure."""
         uploader = create_uploader(base_path="/mail-archive/user/folder")
 
@@ -177,15 +247,14 @@ class TestNASUploaderUpload:
             makedirs_calls.append(path)
             # First call fails with "No such file" to trigger fallback
             if len(makedirs_calls) == 1:
-                raise OSError("[NtStatus 0xc000003a] No such file or directory")
+                raise SMBOSError(NtStatus.STATUS_OBJECT_PATH_NOT_FOUND, path)
 
         with (
             patch("smbclient.register_session"),
             patch("smbclient.makedirs", side_effect=mock_makedirs),
-            patch("smbclient.open_file", mock_open()),
-            patch("smbclient.stat") as mock_stat,
+            patch("smbclient.open_file", side_effect=fake_smb_open),
+            patch("smbclient.listdir", return_value=[]),
         ):
-            mock_stat.side_effect = OSError("File not found")
 
             files_count, _ = uploader.upload_directory(temp_upload_dir)
 
@@ -194,6 +263,117 @@ class TestNASUploaderUpload:
             # Should have multiple makedirs calls due to fallback
             assert len(makedirs_calls) > 1
 
+    def test_upload_creates_directories_before_parallel_writes(self, temp_upload_dir, fake_smb_open):
+        """upload_directory should create all remote directories before any file is written."""
+        uploader = create_uploader(base_path="/archive")
+        events = []
+
+        def record_makedirs(path, exist_ok=False):  # pylint: disable=unused-argument
+            events.append(("makedirs", path))
+
+        def record_open(path, mode="rb"):  # pylint: disable=unused-argument
+            events.append(("open", path))
+            return fake_smb_open()
+
+        with (
+            patch("smbclient.register_session"),
+            patch("smbclient.makedirs", side_effect=record_makedirs),
+            patch("smbclient.open_file", side_effect=record_open),
+            patch("smbclient.listdir", return_value=[]),
+        ):
+            files_count, _ = uploader.upload_directory(temp_upload_dir)
+
+        kinds = [kind for kind, _ in events]
+        assert files_count == 3
+        assert kinds.count("open") == 3
+        first_open = kinds.index("open")
+        assert "makedirs" not in kinds[first_open:]
+
+    def test_upload_pool_uses_configured_workers(self, temp_upload_dir, fake_smb_open):
+        """upload_directory should size its thread pool from max_workers."""
+        uploader = create_uploader()
+        uploader.max_workers = 2
+
+        with (
+            patch("smbclient.register_session"),
+            patch("smbclient.makedirs"),
+            patch("smbclient.open_file", side_effect=fake_smb_open),
+            patch("smbclient.listdir", return_value=[]),
+            patch("src.uploader.ThreadPoolExecutor", wraps=ThreadPoolExecutor) as mock_pool,
+        ):
+            files_count, _ = uploader.upload_directory(temp_upload_dir)
+
+        assert files_count == 3
+        mock_pool.assert_called_once_with(max_workers=2)
+
+    def test_write_file_streams_in_chunks(self, tmp_path):
+        """_write_file_to_nas should copy large files in bounded chunks."""
+        local_file = tmp_path / "large.bin"
+        local_file.write_bytes(b"x" * (UPLOAD_CHUNK_SIZE * 2 + 10))
+        uploader = create_uploader()
+        smbclient = MagicMock()
+        dst = smbclient.open_file.return_value.__enter__.return_value
+
+        result = uploader._write_file_to_nas(  # pylint: disable=protected-access
+            smbclient, local_file, "\\\\nas.local\\backup\\large.bin"
+        )
+
+        assert result == "uploaded"
+        written = [call.args[0] for call in dst.write.call_args_list]
+        assert len(written) == 3
+        assert max(len(chunk) for chunk in written) <= UPLOAD_CHUNK_SIZE
+        assert sum(len(chunk) for chunk in written) == local_file.stat().st_size
+
+    def test_upload_creates_only_deepest_directories(self, temp_upload_dir, fake_smb_open):
+        """upload_directory should call makedirs once per leaf directory, not for each parent."""
+        uploader = create_uploader(base_path="/archive")
+
+        with (
+            patch("smbclient.register_session"),
+            patch("smbclient.makedirs") as mock_makedirs,
+            patch("smbclient.open_file", side_effect=fake_smb_open),
+            patch("smbclient.listdir", return_value=[]),
+        ):
+            uploader.upload_directory(temp_upload_dir)
+
+        created = [call.args[0] for call in mock_makedirs.call_args_list]
+        # Base directory plus the single leaf; the root upload dir is created as its parent
+        assert created == ["\\\\nas.local\\backup\\archive", "\\\\nas.local\\backup\\archive\\subfolder"]
+
+    def test_ensure_directory_ignores_other_errors(self):
+        """_ensure_directory_exists should only fall back level by level for missing paths."""
+        uploader = create_uploader(base_path="/archive")
+        makedirs = MagicMock(side_effect=SMBOSError(NtStatus.STATUS_ACCESS_DENIED, "archive"))
+
+        uploader._ensure_directory_exists(  # pylint: disable=protected-access
+            "\\\\nas.local\\backup\\archive\\user", makedirs
+        )
+
+        makedirs.assert_called_once()
+
+    def test_upload_buffer_reused_per_thread(self):
+        """_get_upload_buffer should hand out the same chunk-sized buffer within a thread."""
+        first = _get_upload_buffer()
+
+        assert _get_upload_buffer() is first
+        assert len(first) == UPLOAD_CHUNK_SIZE
+
+    def test_upload_advances_progress_in_batches(self, temp_upload_dir, fake_smb_open):
+        """upload_directory should advance the progress bar once per batch, not once per file."""
+        uploader = create_uploader(base_path="/archive")
+
+        with (
+            patch("smbclient.register_session"),
+            patch("smbclient.makedirs"),
+            patch("smbclient.open_file", side_effect=fake_smb_open),
+            patch("smbclient.listdir", return_value=[]),
+            patch("src.uploader.create_progress_bar") as mock_progress_bar,
+        ):
+            uploader.upload_directory(temp_upload_dir)
+
+        progress = mock_progress_bar.return_value.__enter__.return_value
+        progress.advance.assert_called_once_with(progress.add_task.return_value, 3)
+
     def test_ensure_directory_creates_path_levels(self):
         """_ensure_directory_exists should create path levels on failure."""
         uploader = create_uploader(base_path="/archive")
@@ -204,7 +384,7 @@ class TestNASUploaderUpload:
             created_paths.append(path)
             # First call fails to trigger level-by-level creation
             if len(created_paths) == 1:
-                raise OSError("[NtStatus 0xc000003a] No such file or directory")
+                raise SMBOSError(NtStatus.STATUS_OBJECT_PATH_NOT_FOUND, path)
 
         uploader._ensure_directory_exists(  # pylint: disable=protected-access
             "\\\\nas.local\\backup\\archive\\user\\folder\\subfolder", mock_makedirs
@@ -320,7 +500,13 @@ class TestNASUploaderPathHandling:
 
         assert uploader.base_path == "mail-archive"
 
-    def test_upload_constructs_correct_unc_paths(self, tmp_path):
+    def test_base_path_collapses_repeated_separators(self):
+        """Repeated and leading backslashes should not produce empty path components."""
+        uploader = create_uploader(base_path="\\\\archive//user\\\\folder")
+
+        assert uploader.base_path == "archive\\user\\folder"
+
+    def test_upload_constructs_correct_unc_paths(self, tmp_path, fake_smb_open):
         """Upload should construct correct UNC paths on Linux."""
         # Create a test file
         test_file = tmp_path / "test.txt"
@@ -336,10 +522,9 @@ class TestNASUploaderPathHandling:
         with (
             patch("smbclient.register_session"),
             patch("smbclient.makedirs", side_effect=capture_makedirs),
-            patch("smbclient.open_file", mock_open()),
-            patch("smbclient.stat") as mock_stat,
+            patch("smbclient.open_file", side_effect=fake_smb_open),
+            patch("smbclient.listdir", return_value=[]),
         ):
-            mock_stat.side_effect = OSError("File not found")
 
             uploader.upload_directory(tmp_path)
 
@@ -350,3 +535,18 @@ class TestNASUploaderPathHandling:
             assert "/" not in path
             # Should have proper structure
             assert "archive\\user\\INBOX" in path
+
+    def test_upload_root_base_path_has_single_separator(self, tmp_path):
+        """Files uploaded to the share root should not get an empty path segment."""
+        (tmp_path / "test.txt").write_text("content")
+        uploader = create_uploader(base_path="/")
+
+        with (
+            patch("smbclient.register_session"),
+            patch("smbclient.makedirs"),
+            patch("smbclient.open_file", mock_open()) as mock_smb_open,
+            patch("smbclient.listdir", return_value=[]),
+        ):
+            uploader.upload_directory(tmp_path)
+
+        mock_smb_open.assert_called_once_with("\\\\nas.local\\backup\\test.txt", mode="wb")
@@ -3,9 +3,13 @@ Tests for utility functions.
 """
 
 from datetime import timedelta
+from email.header import Header
+from unittest.mock import patch
 
 import pytest
+from pathvalidate import sanitize_filename as pathvalidate_sanitize_filename
 from src.config import (
+    DEFAULT_NAS_MAX_WORKERS,
     MailConfig,
     NASConfig,
     parse_time_range,
@@ -13,116 +17,127 @@ from src.config import (
 from src.utils import (
     decode_mime_header,
     delete_directory,
+    sanitize_filename,
 )
 
+# Required NAS variables for NASConfig.from_env
+NAS_ENV = {
+    "NAS_HOST": "nas.local",
+    "NAS_SHARE": "backup",
+    "NAS_USERNAME": "admin",
+    "NAS_PASSWORD": "secret",
+}
 
-class TestParseTimeRange:
-    """Tests for parse_time_range function."""
+# Header values paired with their decoded text
+DECODE_CASES = [
+    ("Simple Subject", "Simple Subject"),
+    ("=?utf-8?b?VGVzdA==?=", "Test"),
+    ("=?utf-8?q?Test_Subject?=", "Test Subject"),
+    ("=?iso-8859-1?q?Caf=E9?=", "Café"),
+]
 
-    def test_parse_days(self):
-        """Should parse day values correctly."""
-        result = parse_time_range("30D")
-        assert result == timedelta(days=30)
-
-    def test_parse_days_lowercase(self):
-        """Should handle lowercase unit."""
-        result = parse_time_range("15d")
-        assert result == timedelta(days=15)
-
-    def test_parse_weeks(self):
-        """Should parse week values correctly."""
-        result = parse_time_range("2W")
-        assert result == timedelta(weeks=2)
-
-    def test_parse_weeks_lowercase(self):
-        """Should handle lowercase unit."""
-        result = parse_time_range("4w")
-        assert result == timedelta(weeks=4)
-
-    def test_parse_months(self):
-        """Should parse month values (approximated as 30 days)."""
-        result = parse_time_range("6M")
-        assert result == timedelta(days=180)  # 6 * 30
-
-    def test_parse_months_lowercase(self):
-        """Should handle lowercase unit."""
-        result = parse_time_range("3m")
-        assert result == timedelta(days=90)  # 3 * 30
-
-    def test_parse_years(self):
-        """Should parse year values (approximated as 365 days)."""
-        result = parse_time_range("1Y")
-        assert result == timedelta(days=365)
-
-    def test_parse_years_lowercase(self):
-        """Should handle lowercase unit."""
-        result = parse_time_range("2y")
-        assert result == timedelta(days=730)  # 2 * 365
-
-    def test_parse_with_whitespace(self):
-        """Should handle leading/trailing whitespace."""
-        result = parse_time_range("  30D  ")
-        assert result == timedelta(days=30)
-
-    def test_invalid_format_no_unit(self):
-        """Should raise ValueError for missing unit."""
-        with pytest.raises(ValueError, match="Invalid time range format"):
-            parse_time_range("30")
 
-    def test_invalid_format_no_number(self):
-        """Should raise ValueError for missing number."""
-        with pytest.raises(ValueError, match="Invalid time range format"):
-            parse_time_range("D")
-
-    def test_invalid_format_invalid_unit(self):
-        """Should raise ValueError for invalid unit."""
-        with pytest.raises(ValueError, match="Invalid time range format"):
-            parse_time_range("30X")
+class TestParseTimeRange:
+    """Tests for parse_time_range function."""
 
-    def test_invalid_format_empty(self):
-        """Should raise ValueError for empty string."""
+    @pytest.mark.parametrize(
+        "value,expected",
+        [
+            ("30D", timedelta(days=30)),
+            ("15d", timedelta(days=15)),
+            ("2W", timedelta(weeks=2)),
+            ("4w", timedelta(weeks=4)),
+            ("6M", timedelta(days=180)),  # months approximated as 30 days
+            ("3m", timedelta(days=90)),
+            ("1Y", timedelta(days=365)),  # years approximated as 365 days
+            ("2y", timedelta(days=730)),
+            ("  30D  ", timedelta(days=30)),
+        ],
+    )
+    def test_parse_valid(self, value, expected):
+        """Should parse every unit in either case, ignoring surrounding whitespace."""
+        assert parse_time_range(value) == expected
+
+    @pytest.mark.parametrize("value", ["30", "D", "30X", ""])
+    def test_invalid_format(self, value):
+        """Should raise ValueError for a missing number, missing or invalid unit, or empty string."""
         with pytest.raises(ValueError, match="Invalid time range format"):
-            parse_time_range("")
+            parse_time_range(value)
 
 
 class TestDecodeMimeHeader:
     """Tests for decode_mime_header function."""
 
-    def test_decode_plain_text(self):
-        """Plain text headers should be returned as-is."""
-        result = decode_mime_header("Simple Subject")
-        assert result == "Simple Subject"
+    @pytest.mark.parametrize("value,expected", DECODE_CASES, ids=["plain", "utf8_base64", "utf8_qp", "iso8859"])
+    def test_decode(self, value, expected):
+        """Plain headers should be returned as-is and encoded words decoded."""
+        assert decode_mime_header(value) == expected
 
     def test_decode_none(self):
         """None should return empty string."""
         result = decode_mime_header(None)
         assert result == ""
 
-    def test_decode_utf8_base64(self):
-        """UTF-8 Base64 encoded headers should be decoded."""
-        # "Test" encoded as UTF-8 Base64
-        encoded = "=?utf-8?b?VGVzdA==?="
-        result = decode_mime_header(encoded)
-        assert result == "Test"
-
-    def test_decode_utf8_quoted_printable(self):
-        """UTF-8 quoted-printable headers should be decoded."""
-        encoded = "=?utf-8?q?Test_Subject?="
-        result = decode_mime_header(encoded)
-        assert result == "Test Subject"
-
     def test_decode_mixed_encoding(self):
         """Headers with mixed plain and encoded parts should work."""
         # Some mail clients mix plain and encoded parts
         result = decode_mime_header("Re: =?utf-8?b?VGVzdA==?=")
         assert "Test" in result
 
-    def test_decode_iso8859(self):
-        """ISO-8859-1 encoded headers should be decoded."""
-        encoded = "=?iso-8859-1?q?Caf=E9?="
-        result = decode_mime_header(encoded)
+    def test_decode_header_object(self):
+        """email.header.Header values (unhashable) should be decoded too."""
+        result = decode_mime_header(Header("Café", "utf-8"))
         assert result == "Café"
 
+    def test_decode_repeated_value(self):
+        """Repeated values should return the same decoded result."""
+        encoded = "=?utf-8?b?VGVzdA==?="
+        assert decode_mime_header(encoded) == decode_mime_header(encoded) == "Test"
+
+    def test_decode_plain_value_skips_parser(self):
+        """Values without encoded words should be returned without parsing or caching."""
+        with patch("src.utils._decode_mime_header_cached") as mock_cached:
+            assert decode_mime_header("Meeting notes") == "Meeting notes"
+            decode_mime_header("=?utf-8?b?VGVzdA==?=")
+
+        mock_cached.assert_called_once_with("=?utf-8?b?VGVzdA==?=")
+
+
+class TestSanitizeFilename:
+    """Tests for sanitize_filename function."""
+
+    def test_removes_invalid_characters(self):
+        """Invalid filesystem characters should be removed."""
+        result = sanitize_filename('Report: Q1/Q2 "Final".pdf')
+        assert not any(c in result for c in ':/"')
+        assert result.endswith(".pdf")
+
+    @pytest.mark.parametrize(
+        "name",
+        [
+            "Test Subject",
+            "Vertrag_für_Müller.pdf",
+            "Re: Meeting (2024) [draft]",
+            "CON",
+            "con.txt",
+            " leading space",
+            "trailing period.",
+            "x" * 300,
+            "tab\tand\nnewline",
+            "😀 emoji",
+        ],
+    )
+    def test_matches_pathvalidate(self, name):
+        """Plain-name fast path must give the same result as pathvalidate."""
+        assert sanitize_filename(name) == pathvalidate_sanitize_filename(name)
+
+    def test_results_are_cached(self):
+        """Repeated names should be served from the cache."""
+        sanitize_filename.cache_clear()
+        sanitize_filename("image001.png")
+        sanitize_filename("image001.png")
+        assert sanitize_filename.cache_info().hits == 1
+
 
 class TestDeleteDirectory:
     """Tests for delete_directory function."""
@@ -140,10 +155,8 @@ class TestDeleteDirectory:
 
     def test_delete_nested_directory(self, tmp_path):
         """Should delete nested directories."""
-        test_dir = tmp_path / "parent" / "child" / "grandchild"
-        test_dir.mkdir(parents=True)
-        (test_dir / "file.txt").write_text("content")
         parent = tmp_path / "parent"
+        (parent / "child").mkdir(parents=True)
 
         result = delete_directory(parent)
 
@@ -162,13 +175,9 @@ class TestDeleteDirectory:
 class TestNASConfig:
     """Tests for NASConfig dataclass."""
 
-    def test_from_env_with_all_vars(self, monkeypatch):
+    def test_from_env_with_all_vars(self, env):
         """Should create NASConfig when all env vars are set."""
-        monkeypatch.setenv("NAS_HOST", "nas.local")
-        monkeypatch.setenv("NAS_SHARE", "backup")
-        monkeypatch.setenv("NAS_USERNAME", "admin")
-        monkeypatch.setenv("NAS_PASSWORD", "secret")
-        monkeypatch.setenv("NAS_PATH", "/archive")
+        env({**NAS_ENV, "NAS_PATH": "/archive"})
 
         config = NASConfig.from_env()
 
@@ -179,42 +188,37 @@ class TestNASConfig:
         assert config.password == "secret"
         assert config.base_path == "/archive"
 
-    def test_from_env_missing_required(self, monkeypatch):
-        """Should return None when required vars are missing."""
-        monkeypatch.setenv("NAS_HOST", "nas.local")
-        # Missing NAS_SHARE, NAS_USERNAME, NAS_PASSWORD
-        monkeypatch.delenv("NAS_SHARE", raising=False)
-        monkeypatch.delenv("NAS_USERNAME", raising=False)
-        monkeypatch.delenv("NAS_PASSWORD", raising=False)
+    @pytest.mark.parametrize("missing", ["NAS_SHARE", "NAS_USERNAME", "NAS_PASSWORD"])
+    def test_from_env_missing_required(self, env, missing):
+        """Should return None when a required var is missing."""
+        env({key: value for key, value in NAS_ENV.items() if key != missing})
 
         config = NASConfig.from_env()
 
         assert config is None
 
-    def test_from_env_default_path(self, monkeypatch):
+    def test_from_env_default_path(self, env):
         """Should use default path when NAS_PATH not set."""
-        monkeypatch.setenv("NAS_HOST", "nas.local")
-        monkeypatch.setenv("NAS_SHARE", "backup")
-        monkeypatch.setenv("NAS_USERNAME", "admin")
-        monkeypatch.setenv("NAS_PASSWORD", "secret")
-        monkeypatch.delenv("NAS_PATH", raising=False)
+        env(NAS_ENV)
 
         config = NASConfig.from_env()
 
         assert config is not None
         assert config.base_path == "/mail-archive"
 
-    def test_get_folder_path(self):
-        """Should build correct folder path."""
-        config = NASConfig(
-            host="nas.local",
-            share="backup",
-            username="admin",
-            password="secret",
-            base_path="/mail-archive",
-        )
+    def test_from_env_max_workers(self, env):
+        """Should read NAS_MAX_WORKERS and fall back to the default when invalid."""
+        env({**NAS_ENV, "NAS_MAX_WORKERS": "4"})
+
+        assert NASConfig.from_env().max_workers == 4
+
+        env({**NAS_ENV, "NAS_MAX_WORKERS": "many"})
 
-        path = config.get_folder_path("john", "INBOX")
+        assert NASConfig.from_env().max_workers == DEFAULT_NAS_MAX_WORKERS
+
+    def test_get_folder_path(self, nas_config):
+        """Should build correct folder path."""
+        path = nas_config.get_folder_path("john", "INBOX")
 
         assert path == "/mail-archive/john/INBOX"
 
@@ -222,10 +226,9 @@ class TestNASConfig:
 class TestMailConfig:
     """Tests for MailConfig dataclass."""
 
-    def test_from_env_with_all_vars(self, monkeypatch):
+    def test_from_env_with_all_vars(self, env):
         """Should create MailConfig when all env vars are set."""
-        monkeypatch.setenv("MAIL_EMAIL", "test@example.com")
-        monkeypatch.setenv("MAIL_PASSWORD", "secret123")
+        env({"MAIL_EMAIL": "test@example.com", "MAIL_PASSWORD": "secret123"})
 
         config = MailConfig.from_env("gmail")
 
@@ -234,32 +237,25 @@ class TestMailConfig:
         assert config.password == "secret123"
         assert config.provider == "gmail"
 
-    def test_from_env_missing_email(self, monkeypatch):
-        """Should return None when email is missing."""
-        monkeypatch.delenv("MAIL_EMAIL", raising=False)
-        monkeypatch.setenv("MAIL_PASSWORD", "secret123")
+    @pytest.mark.parametrize(
+        "variables",
+        [{"MAIL_PASSWORD": "secret123"}, {"MAIL_EMAIL": "test@example.com"}],
+        ids=["missing_email", "missing_password"],
+    )
+    def test_from_env_missing_credentials(self, env, variables):
+        """Should return None when the email or password is missing."""
+        env(variables)
 
         config = MailConfig.from_env("gmail")
 
         assert config is None
 
-    def test_from_env_missing_password(self, monkeypatch):
-        """Should return None when password is missing."""
-        monkeypatch.setenv("MAIL_EMAIL", "test@example.com")
-        monkeypatch.delenv("MAIL_PASSWORD", raising=False)
-
-        config = MailConfig.from_env("gmail")
-
-        assert config is None
-
-    def test_account_name_property(self):
+    @pytest.mark.parametrize(
+        "email,expected",
+        [("john.doe@example.com", "john.doe"), ("admin@company.co.uk", "admin")],
+    )
+    def test_account_name_property(self, email, expected):
         """Should return email without domain."""
-        config = MailConfig(email="john.doe@example.com", password="secret", provider="gmail")
-
-        assert config.account_name == "john.doe"
-
-    def test_account_name_simple_email(self):
-        """Should handle simple email addresses."""
-        config = MailConfig(email="admin@company.co.uk", password="secret", provider="outlook")
+        config = MailConfig(email=email, password="secret", provider="gmail")
 
-        assert config.account_name == "admin"
+        assert config.account_name == expected